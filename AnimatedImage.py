@@ -0,0 +1,301 @@
+from pathlib import Path
+
+from PyQt6.QtCore import QObject, QSize, pyqtSignal
+from PyQt6.QtGui import QImageReader
+
+from DesktopAssistant.AssetLoader import AssetLoader, get_asset_loader, get_scaled_size
+from DesktopAssistant.SpriteCache import SpriteCache
+
+# Animated images can sit next to the numbered frames, each one is its own sequence. APNGs need the .apng
+# extension so they aren't mistaken for a frame
+ANIMATION_SUFFIXES = (".gif", ".webp", ".apng")
+
+# Browsers show frames with a delay this short or unset for DEFAULT_FRAME_DELAY instead, and art is made to
+# look right in a browser, so do the same
+MIN_FRAME_DELAY = 20
+DEFAULT_FRAME_DELAY = 100
+
+
+def find_animations(image_dir):
+    """
+    Lists the animated images in a directory
+    :param image_dir: Directory to look in
+    :return: List of (path, sequence name) tuples, the name being the file name without underscores like the
+    numbered frames
+    """
+    return [(path, path.stem.replace("_", "")) for path in sorted(Path(image_dir).glob("*"))
+            if path.suffix.lower() in ANIMATION_SUFFIXES]
+
+
+def get_frame_delay(delay):
+    """
+    :param delay: Milliseconds a frame asks to be shown for
+    :return: Milliseconds it's actually shown for
+    """
+    return delay if delay >= MIN_FRAME_DELAY else DEFAULT_FRAME_DELAY
+
+
+def read_frames_qt(path, size):
+    """
+    Decodes an animation with Qt, one frame at a time as the iterator is advanced
+    :param path: Path of the image file
+    :param size: (width, height) tuple to resize to
+    :return: Iterator of (QImage, delay in milliseconds) tuples, or None if Qt can't animate the format
+    :raises OSError: If the file can't be opened
+    """
+    reader = QImageReader(str(Path(path).absolute()))
+    if reader.format().isEmpty() or not reader.supportsAnimation():
+        if not Path(path).is_file():
+            raise FileNotFoundError(f"No such file: '{path}'")
+        return None
+
+    reader.setScaledSize(QSize(*size))
+    return iter_reader_frames(reader)
+
+
+def iter_reader_frames(reader):
+    while reader.canRead():
+        image = reader.read()
+        if image.isNull():
+            raise OSError(reader.errorString())
+        yield image, get_frame_delay(reader.nextImageDelay())
+
+
+def read_frames_pil(path, size):
+    """
+    Decodes an animation with PIL, which also handles APNGs. PIL is optional and only imported the first
+    time it's needed
+    :return: Iterator of (QImage, delay in milliseconds) tuples, or None if PIL isn't installed
+    """
+    try:
+        import PIL
+    except ImportError:
+        return None
+    return iter_pil_frames(path, size)
+
+
+def iter_pil_frames(path, size):
+    from PIL import Image, ImageSequence
+    from PIL.ImageQt import ImageQt
+
+    with Image.open(Path(path).absolute()) as image:
+        for frame in ImageSequence.Iterator(image):
+            delay = frame.info.get("duration", 0)
+            frame = frame.convert("RGBA").resize(size, Image.Resampling.LANCZOS)
+
+            # ImageQt keeps pointing at the PIL buffer, so copy it out before the next frame replaces it
+            yield ImageQt(frame).copy(), get_frame_delay(round(delay))
+
+
+# Tried in order until one can animate the file
+FRAME_READERS = {"qt": read_frames_qt, "pil": read_frames_pil}
+
+
+def read_frames(path, size):
+    """
+    Opens an animated image with the first reader that can animate it
+    :param path: Path of the image file
+    :param size: (width, height) tuple to resize to
+    :return: Iterator of (QImage, delay in milliseconds) tuples, the images in the sprite cache's format
+    :raises OSError: If the file can't be opened or no reader can handle it
+    """
+    for reader in FRAME_READERS.values():
+        frames = reader(path, size)
+        if frames is not None:
+            return ((image.convertToFormat(SpriteCache.FORMAT), delay) for image, delay in frames)
+    raise OSError(f"Unsupported animation format: {path}")
+
+
+class FrameStream(QObject):
+    """
+    Plays an animated image without decoding all of it up front. Opening it reads through the file once in
+    the background for the frame delays, keeping only the first LOOKAHEAD frames. The rest are decoded again
+    a few at a time just ahead of the frame on screen, so however long the animation is, there are never more
+    than 2 * LOOKAHEAD of its frames in memory.
+
+    Decoding happens on the asset loader's thread pool, one job per stream at a time, and the frames come back
+    already converted to pixmaps. Everything else is only called from the GUI thread.
+    """
+    LOOKAHEAD = 4
+
+    # (generation, head QImages, delays), and (generation, frame iterator, index it's up to, index -> QImage)
+    scanned = pyqtSignal(int, object, object)
+    decoded = pyqtSignal(int, object, int, object)
+
+    def __init__(self, path, size, scale, convert, *args, **kwargs):
+        """
+        :param path: Path of the animated image
+        :param size: (width, height) tuple the frames are shown at
+        :param scale: Device pixel ratio to decode the frames for
+        :param convert: Function turning a decoded QImage into a QPixmap
+        """
+        super(FrameStream, self).__init__(*args, **kwargs)
+
+        self.path = path
+        self.size = size
+        self.scale = scale
+        self.convert = convert
+
+        # Milliseconds each frame is shown for, filled in once the stream is open
+        self.delays = []
+
+        # Pixmaps of the first frames are kept the whole time, so the animation can always start over
+        # straight away. The frames after them come and go in the buffer, index -> pixmap
+        self.head = []
+        self.buffer = {}
+
+        # Decoding carries on from where the last job got to if it can. The iterator is handed to the job and
+        # back again, so only one thread ever has it
+        self.frames = None
+        self.next_index = 0
+        self.busy = False
+
+        # Frame on screen, and the last one that should be decoded ahead of it
+        self.position = 0
+        self.wanted = 0
+
+        # Bumped on close, so jobs that were still running are ignored
+        self.generation = 0
+        self.on_opened = None
+
+        self.scanned.connect(self.on_scanned)
+        self.decoded.connect(self.on_decoded)
+
+    def open(self, callback):
+        """
+        Starts reading the file in the background
+        :param callback: Called with no arguments once the delays and first frames are in, even if the file
+        couldn't be read, in which case there aren't any frames
+        """
+        self.on_opened = callback
+        generation = self.generation
+        get_asset_loader().thread_pool.start(lambda: self.scan(generation), AssetLoader.PRIORITY_HIGH)
+
+    def close(self):
+        """
+        Lets go of every frame and anything still being decoded
+        """
+        self.generation += 1
+        self.on_opened = None
+        self.delays = []
+        self.head = []
+        self.buffer = {}
+        self.frames = None
+        self.busy = False
+
+    def get_frame(self, index):
+        """
+        :return: The frame's pixmap, or None if it hasn't been decoded yet
+        """
+        if index < len(self.head):
+            return self.head[index]
+        return self.buffer.get(index)
+
+    def seek(self, index):
+        """
+        Moves the buffer along to a frame, dropping the ones that are past and decoding the next few
+        :param index: Frame that's about to be shown
+        """
+        self.position = index
+        self.wanted = min(index + self.LOOKAHEAD, len(self.delays)) - 1
+        self.buffer = {buffered: pixmap for buffered, pixmap in self.buffer.items()
+                       if index <= buffered <= self.wanted}
+        self.decode_ahead()
+
+    def rewind(self):
+        """
+        Goes back to the start once the animation stops playing, keeping just the first frames
+        """
+        self.seek(0)
+        if not self.busy:
+            self.frames = None
+
+    def decode_ahead(self):
+        """
+        Starts a job for the frames that are wanted but not buffered yet, unless one is already running
+        """
+        missing = [index for index in range(max(self.position, len(self.head)), self.wanted + 1)
+                   if index not in self.buffer]
+        if self.busy or not missing:
+            return
+
+        # Frames are decoded in order, so going back means starting over from the first one
+        frames, next_index = self.frames, self.next_index
+        if frames is None or next_index > missing[0]:
+            frames, next_index = None, 0
+
+        self.busy = True
+        self.frames = None
+        generation = self.generation
+        first, last = missing[0], self.wanted
+        get_asset_loader().thread_pool.start(lambda: self.decode(generation, frames, next_index, first, last),
+                                             AssetLoader.PRIORITY_HIGH)
+
+    def read(self):
+        return read_frames(self.path, get_scaled_size(self.size, self.scale))
+
+    def scan(self, generation):
+        """
+        Reads through every frame for its delay, keeping the first few. Runs on a worker thread
+        """
+        images, delays = [], []
+        try:
+            for image, delay in self.read():
+                if len(images) < self.LOOKAHEAD:
+                    images.append(image)
+                delays.append(delay)
+        except Exception as error:
+            # Corrupt files can raise all sorts, the stream still has to open or the frame load never finishes
+            print(f"Error loading animation {self.path}: {error}")
+            images, delays = [], []
+        self.scanned.emit(generation, images, delays)
+
+    def decode(self, generation, frames, next_index, first, last):
+        """
+        Decodes frames first to last, carrying on with an iterator that's up to next_index. Runs on a worker
+        thread
+        """
+        images = {}
+        try:
+            if frames is None:
+                frames = self.read()
+            for image, delay in frames:
+                next_index += 1
+                if next_index - 1 >= first:
+                    images[next_index - 1] = image
+                if next_index > last:
+                    break
+        except Exception as error:
+            print(f"Error loading animation {self.path}: {error}")
+            frames = None
+        self.decoded.emit(generation, frames, next_index, images)
+
+    def on_scanned(self, generation, images, delays):
+        if generation != self.generation:
+            return
+
+        for image in images:
+            image.setDevicePixelRatio(self.scale)
+        self.head = [self.convert(image) for image in images]
+        self.delays = delays
+
+        callback, self.on_opened = self.on_opened, None
+        if callback:
+            callback()
+
+    def on_decoded(self, generation, frames, next_index, images):
+        if generation != self.generation:
+            return
+
+        self.busy = False
+        self.frames, self.next_index = frames, next_index
+
+        # The animation might have moved on while these were decoding, so only keep what's still wanted
+        for index, image in images.items():
+            if self.position <= index <= self.wanted:
+                image.setDevicePixelRatio(self.scale)
+                self.buffer[index] = self.convert(image)
+
+        # A file that stopped reading part way through would only fail again
+        if images:
+            self.decode_ahead()
@@ -0,0 +1,166 @@
+import math
+import random
+
+
+class AnimationTimeline:
+    """
+    Works out the break animation ahead of time instead of polling it. Time is measured in ticks, and from
+    the frame sequences, the page read dwell and the blink schedule the timeline knows exactly how many
+    ticks pass before the next visible change, so the widget only needs to wake up for those.
+
+    The rules match the old fixed rate animation:
+    - The first frame of a sequence is held for dwell_ticks extra ticks so Linear reads the page
+    - Every other frame is shown for a single tick
+    - Every blink_min to blink_max ticks the closed eye version of the frame is shown for one tick,
+      a blink_max of 0 turns blinking off
+    - After the last frame, the next sequence is picked from a weighted transition table
+    - Sequences from animated images keep their own timing instead, each frame is shown for however many
+      ticks it's given, fractions included, with no page read dwell
+    """
+
+    # Picking a "Smile" sequence used to be rerolled up to this many times to make staring less common
+    SMILE_RETRIES = 3
+
+    def __init__(self, sequences, dwell_ticks, blink_min, blink_max, rng=None):
+        """
+        :param sequences: Dictionary of sequence name to frame count, or to a list of ticks each frame is shown
+        for
+        :param dwell_ticks: Extra ticks the first frame of a sequence is held for
+        :param blink_min: Minimum ticks between blinks
+        :param blink_max: Maximum ticks between blinks, 0 to never blink
+        :param rng: Random number generator to use, pass a seeded one to replay a run exactly
+        """
+        self.sequences = dict(sequences)
+        self.dwell_ticks = dwell_ticks
+        self.blink_min = blink_min
+        self.blink_max = blink_max
+        self.rng = rng or random.Random()
+        self.transitions = self.build_transition_table(self.sequences)
+
+        self.current_name = ""
+        self.current_index = 0
+        self.eyes_closed = False
+        self.ticks_until_frame = 0
+        self.ticks_until_blink = 0
+        self.reset()
+
+    @classmethod
+    def build_transition_table(cls, sequences):
+        """
+        Precomputes the odds of moving to each sequence. Uses the same odds as rerolling up to SMILE_RETRIES
+        times whenever a "Smile" sequence is picked
+        :param sequences: Dictionary of sequence name to frame count
+        :return: Dictionary of sequence name to a (next names, cumulative weights) tuple
+        """
+        names = sorted(sequences)
+        if not names:
+            return {}
+
+        smile_chance = sum("Smile" in name for name in names) / len(names)
+        weights = []
+        for name in names:
+            if "Smile" in name:
+                # Only picked if every earlier roll was a smile too
+                weights.append(smile_chance ** (cls.SMILE_RETRIES - 1) / len(names))
+            else:
+                weights.append(sum(smile_chance ** retry for retry in range(cls.SMILE_RETRIES)) / len(names))
+
+        cumulative_weights = []
+        total = 0
+        for weight in weights:
+            total += weight
+            cumulative_weights.append(total)
+
+        # Sequences don't affect what comes after them, but keeping it per sequence leaves room for that
+        return {name: (names, cumulative_weights) for name in names}
+
+    def reset(self):
+        """
+        Starts again from the first frame of a random sequence
+        """
+        self.current_name = self.pick_next_sequence()
+        self.current_index = 0
+        self.eyes_closed = False
+        self.ticks_until_frame = self.get_frame_ticks()
+        self.ticks_until_blink = self.roll_blink()
+
+    def set_sequences(self, sequences):
+        """
+        Changes how long the frames are shown for, such as when the tick length changes. The names and frame
+        counts have to stay the same
+        :param sequences: Dictionary of sequence name to frame count or list of frame ticks
+        """
+        self.sequences = dict(sequences)
+
+    def set_blink_range(self, blink_min, blink_max):
+        """
+        Changes how often blinks happen, starting from the next blink
+        :param blink_min: Minimum ticks between blinks
+        :param blink_max: Maximum ticks between blinks, 0 to never blink
+        """
+        self.blink_min = blink_min
+        self.blink_max = blink_max
+        if self.blink_max <= 0 or self.ticks_until_blink > self.blink_max:
+            self.ticks_until_blink = self.roll_blink()
+
+    def roll_blink(self):
+        """
+        :return: Ticks until the next blink
+        """
+        if self.blink_max <= 0:
+            return math.inf
+        return self.rng.randint(self.blink_min, self.blink_max)
+
+    def pick_next_sequence(self):
+        if not self.sequences:
+            return ""
+
+        names, cumulative_weights = self.transitions.get(self.current_name, next(iter(self.transitions.values())))
+        return self.rng.choices(names, cum_weights=cumulative_weights)[0]
+
+    def get_sequence_length(self, name):
+        frames = self.sequences[name]
+        return len(frames) if isinstance(frames, list) else frames
+
+    def get_frame_ticks(self):
+        """
+        :return: How many ticks the current frame is shown for
+        """
+        frames = self.sequences.get(self.current_name)
+        if isinstance(frames, list):
+            return frames[self.current_index]
+        if self.current_index == 0:
+            return self.dwell_ticks + 1
+        return 1
+
+    def get_ticks_until_change(self):
+        """
+        :return: Ticks until the next visible change, be it a new frame or the eyes opening or closing
+        """
+        ticks = min(self.ticks_until_frame, self.ticks_until_blink)
+        if self.eyes_closed:
+            # Frames with their own timing can move on before the blink is over
+            ticks = min(self.ticks_until_frame, 1)
+        return ticks
+
+    def advance(self):
+        """
+        Jumps straight to the next visible change
+        :return: Number of ticks that passed
+        """
+        ticks = self.get_ticks_until_change()
+        self.ticks_until_frame -= ticks
+        self.ticks_until_blink -= ticks
+
+        if self.ticks_until_frame <= 0:
+            self.current_index += 1
+            if self.current_index >= self.get_sequence_length(self.current_name):
+                self.current_index = 0
+                self.current_name = self.pick_next_sequence()
+            self.ticks_until_frame = self.get_frame_ticks()
+
+        self.eyes_closed = self.ticks_until_blink <= 0
+        if self.eyes_closed:
+            self.ticks_until_blink = self.roll_blink()
+
+        return ticks
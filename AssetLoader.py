@@ -0,0 +1,260 @@
+import ctypes
+import sys
+from pathlib import Path
+
+from PyQt6.QtCore import QCoreApplication, QObject, QRunnable, QSize, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+from DesktopAssistant.SpriteAtlas import sprite_atlas
+from DesktopAssistant.SpriteCache import SpriteCache, sprite_cache
+
+
+def get_scaled_size(size, scale):
+    """
+    :param size: (width, height) tuple an image is shown at
+    :param scale: Device pixel ratio of the screen
+    :return: (width, height) tuple of the pixels needed to show it without Qt scaling it
+    """
+    return round(size[0] * scale), round(size[1] * scale)
+
+
+def read_qt(path, size):
+    """
+    Decodes an image with Qt, scaling it as it's read with a smooth filter. Goes straight to a QImage, so
+    there's no extra copy of every frame like there is coming from PIL
+    :param path: Path of the image file
+    :param size: (width, height) tuple to resize to
+    :return: The resized QImage, or None if Qt can't read the format
+    :raises OSError: If the file can't be opened
+    """
+    reader = QImageReader(str(Path(path).absolute()))
+    if reader.format().isEmpty():
+        if not Path(path).is_file():
+            raise FileNotFoundError(f"No such file: '{path}'")
+        return None
+
+    reader.setScaledSize(QSize(*size))
+    image = reader.read()
+    if image.isNull():
+        raise OSError(reader.errorString())
+    return image
+
+
+def read_pil(path, size):
+    """
+    Decodes an image with PIL, for formats Qt doesn't have a plugin for. PIL is optional and only imported
+    the first time it's needed
+    :return: The resized QImage, or None if PIL isn't installed
+    """
+    try:
+        from PIL import Image
+        from PIL.ImageQt import ImageQt
+    except ImportError:
+        return None
+
+    with Image.open(Path(path).absolute()) as image:
+        image = image.convert("RGBA").resize(size, Image.Resampling.LANCZOS)
+
+    # ImageQt keeps pointing at the PIL buffer, so copy it out before the PIL image goes away
+    qt_image = ImageQt(image)
+    return qt_image.copy()
+
+
+# Tried in order until one can read the file
+IMAGE_READERS = {"qt": read_qt, "pil": read_pil}
+
+
+def read_image(path, size):
+    """
+    Opens and resizes an image file with the first reader that understands its format
+    :param path: Path of the image file
+    :param size: (width, height) tuple to resize to
+    :return: The resized QImage in the sprite cache's format
+    :raises OSError: If the file can't be opened or no reader can handle it
+    """
+    for reader in IMAGE_READERS.values():
+        image = reader(path, size)
+        if image is not None:
+            return image.convertToFormat(SpriteCache.FORMAT)
+    raise OSError(f"Unsupported image format: {path}")
+
+
+def decode_image(path, size, scale=1):
+    """
+    Loads an image at the given size, cutting it out of the sprite atlas if it's packed in there.
+    Safe to call from a worker thread since it only produces a QImage, pixmaps still have to be made
+    on the GUI thread
+    :param path: Path of the image file
+    :param size: (width, height) tuple the image is shown at
+    :param scale: Device pixel ratio of the screen. The image has that many times more pixels and is tagged
+    with the ratio, so Qt draws it at size without scaling it
+    :return: The resized QImage
+    """
+    image = sprite_atlas.get_image(path, size, scale, decode_file)
+    if image is None:
+        image = decode_file(path, get_scaled_size(size, scale))
+    image.setDevicePixelRatio(scale)
+    return image
+
+
+def decode_file(path, size):
+    """
+    Opens and resizes an image file, going through the on disk sprite cache when it's up to date
+    :param path: Path of the image file
+    :param size: (width, height) tuple to resize to
+    :return: The resized QImage
+    """
+    image = sprite_cache.load(path, size)
+    if image is not None:
+        return image
+
+    image = read_image(path, size)
+    sprite_cache.store(path, size, image)
+    return image
+
+
+def trim_memory():
+    """
+    Gives memory freed from big images back to the OS. glibc holds onto it for reuse otherwise, so letting go
+    of art wouldn't make the process any smaller. Windows and macOS already give large blocks back when
+    they're freed
+    """
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        # Not glibc
+        pass
+
+
+class DecodeSignals(QObject):
+    """
+    QRunnable isn't a QObject, so the decode jobs report back through this instead
+    """
+    decoded = pyqtSignal(object, QImage)
+
+
+class DecodeJob(QRunnable):
+    """
+    Decodes a single image on the thread pool
+    """
+
+    def __init__(self, key, signals):
+        super(DecodeJob, self).__init__()
+        self.key = key
+        self.signals = signals
+
+    def run(self):
+        path, size, scale = self.key
+        try:
+            image = decode_image(path, size, scale)
+        except Exception as error:
+            # Anything can come out of a corrupt file, such as PIL's DecompressionBombError or a ValueError.
+            # Whatever it is, whoever's waiting still has to hear back or their whole group never finishes
+            print(f"Error loading image {path}: {error}")
+            image = QImage()
+        self.signals.decoded.emit(self.key, image)
+
+
+class AssetLoader(QObject):
+    """
+    Decodes images on a thread pool so the GUI thread never blocks on opening and resizing art.
+    Requests are handed out by priority, so anything needed for the first scene should use PRIORITY_HIGH
+    and everything else can stream in behind it.
+    """
+    PRIORITY_HIGH = 10
+    PRIORITY_LOW = 0
+
+    def __init__(self, *args, **kwargs):
+        super(AssetLoader, self).__init__(*args, **kwargs)
+
+        self.thread_pool = QThreadPool(self)
+        self.signals = DecodeSignals()
+        self.signals.decoded.connect(self.on_decoded)
+
+        # (path, size, scale) -> callbacks waiting on an unfinished decode. Finished images aren't kept
+        # around here, whoever asked for them holds onto the result
+        self.pending = {}
+
+        # Images are decoded for this device pixel ratio, see set_device_pixel_ratio
+        self.device_pixel_ratio = 1
+
+    def set_device_pixel_ratio(self, ratio):
+        """
+        Sets the device pixel ratio images are decoded for. Should be set before anything is loaded, images
+        that were already handed out keep the old one
+        :param ratio: Ratio of the screen, such as QScreen.devicePixelRatio()
+        """
+        self.device_pixel_ratio = ratio
+
+    def request(self, path, size, callback, priority=PRIORITY_LOW):
+        """
+        Asks for an image to be decoded. The callback is always called on the GUI thread.
+        :param path: Path of the image file
+        :param size: (width, height) tuple the image is shown at
+        :param callback: Called with the decoded QImage
+        :param priority: Higher priority requests are decoded first
+        """
+        key = (str(path), tuple(size), self.device_pixel_ratio)
+
+        # Only queue one decode per image, no matter how many things are waiting on it
+        if key in self.pending:
+            self.pending[key].append(callback)
+            return
+
+        self.pending[key] = [callback]
+        self.thread_pool.start(DecodeJob(key, self.signals), priority)
+
+    def request_all(self, requests, callback, finished_callback=None, priority=PRIORITY_LOW):
+        """
+        Asks for a group of images, with an optional callback once every one of them has arrived
+        :param requests: List of (path, size) tuples
+        :param callback: Called with (path, QImage) for each image
+        :param finished_callback: Called with no arguments after the last image arrives
+        :param priority: Higher priority requests are decoded first
+        """
+        remaining = [len(requests)]
+
+        def on_image(path, image):
+            callback(path, image)
+            remaining[0] -= 1
+            if remaining[0] == 0 and finished_callback:
+                finished_callback()
+
+        if not requests and finished_callback:
+            finished_callback()
+
+        for path, size in requests:
+            self.request(path, size, lambda image, path=path: on_image(path, image), priority)
+
+    def on_decoded(self, key, image):
+        for callback in self.pending.pop(key, []):
+            callback(image)
+
+        # Everything that wanted a sprite has its own copy by now
+        if not self.pending:
+            sprite_atlas.release()
+
+    def wait_for_done(self):
+        """
+        Blocks until every queued decode is finished. Only meant for scripts and tools, the GUI should
+        use the callbacks instead.
+        """
+        self.thread_pool.waitForDone()
+
+        # Finished decodes are delivered through queued signals, so let those through too
+        QCoreApplication.processEvents()
+
+
+asset_loader = None
+
+
+def get_asset_loader():
+    """
+    Returns the process wide asset loader, creating it the first time
+    """
+    global asset_loader
+    if asset_loader is None:
+        asset_loader = AssetLoader()
+    return asset_loader
@@ -0,0 +1,118 @@
+import os
+from pathlib import Path
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from DesktopAssistant.ImageCache import image_cache
+from DesktopAssistant.SpriteAtlas import get_sprite_key, sprite_atlas
+
+
+class AssetWatcher(QObject):
+    """
+    Watches the art folders and every folder inside them, so art that's swapped out while the app is running
+    shows up without a restart. A folder that doesn't exist yet has its nearest existing parent watched
+    instead, so one that's made later (like Packs/ when the first pack is installed) is picked up too.
+    QFileSystemWatcher only says that something changed, so each file's modified time and size are compared
+    against the last look to work out exactly which files did. Only those are dropped from the sprite atlas
+    and image cache before anyone is told, everything else stays decoded.
+    """
+    # Editors write files in a few steps, but someone touching up a frame wants to see it straight away, so
+    # this is much shorter than the config's reload delay
+    RELOAD_DELAY = 30
+
+    # Emitted with the set of absolute Paths that were added, changed or removed
+    changed = pyqtSignal(object)
+
+    def __init__(self, directories, *args, **kwargs):
+        """
+        :param directories: Folders to watch, they don't have to exist yet
+        """
+        super(AssetWatcher, self).__init__(*args, **kwargs)
+
+        self.directories = [Path(directory).absolute() for directory in directories]
+
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(self.RELOAD_DELAY)
+        self.reload_timer.timeout.connect(self.check)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.reload_timer.start)
+        self.watcher.directoryChanged.connect(self.reload_timer.start)
+
+        # Path -> (modified time, size) of every file as of the last check
+        self.files, folders = self.scan()
+        self.watch_paths(folders)
+
+    def scan(self):
+        """
+        :return: (dictionary of Path to (modified time, size) for every file, list of every folder) tuple
+        """
+        files, folders = {}, []
+        for directory in self.directories:
+            for root, dirnames, filenames in os.walk(directory):
+                folders.append(root)
+                for filename in filenames:
+                    path = Path(root) / filename
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files, folders
+
+    def get_missing_parents(self):
+        """
+        :return: Set of the nearest existing parent of every watched folder that doesn't exist yet
+        """
+        parents = set()
+        for directory in self.directories:
+            if directory.is_dir():
+                continue
+            parent = directory.parent
+            while not parent.is_dir() and parent != parent.parent:
+                parent = parent.parent
+            parents.add(str(parent))
+        return parents
+
+    def watch_paths(self, folders):
+        """
+        New folders need watching too, and files that are replaced rather than written in place drop out of
+        the watcher, so this adds anything that's missing. Parents that were only watched while waiting for a
+        folder to be made are dropped once it's there, they can be busy (the working folder gets the config
+        and history written to it)
+        :param folders: Every folder found by the last scan
+        :return: Whether any folder was newly watched
+        """
+        wanted = set(folders) | self.get_missing_parents()
+        watched_folders = set(self.watcher.directories())
+        stale = watched_folders - wanted
+        if stale:
+            self.watcher.removePaths(list(stale))
+
+        watched = set(self.watcher.files()) | watched_folders
+        new_folders = [path for path in wanted if path not in watched]
+        paths = new_folders + [str(path) for path in self.files if str(path) not in watched]
+        if paths:
+            self.watcher.addPaths(paths)
+        return bool(new_folders)
+
+    def check(self):
+        """
+        Works out which files changed since the last check, drops them from the caches, then lets everyone
+        know
+        """
+        files, folders = self.scan()
+        changed = {path for path in files.keys() | self.files.keys() if files.get(path) != self.files.get(path)}
+        self.files = files
+        if self.watch_paths(folders):
+            # Anything copied into a new folder between the scan and it being watched would be missed, so
+            # look again once the copy has had a moment to settle
+            self.reload_timer.start()
+        if not changed:
+            return
+
+        sprite_atlas.invalidate(changed)
+        keys = {get_sprite_key(path) for path in changed}
+        image_cache.evict_matching(lambda path: get_sprite_key(path) in keys)
+        self.changed.emit(changed)
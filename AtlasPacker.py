@@ -0,0 +1,216 @@
+"""
+Packs the character art into a sprite atlas plus a JSON manifest, so the app can load every sprite with one
+decode instead of opening each file. Sprites are resized to the size the app shows them at while packing, with
+an atlas for each common device pixel ratio so high DPI screens get sharp art without Qt scaling it.
+Run it again after changing anything in the packed folders, sprites that no longer match the atlas are loaded
+from their own files until then.
+
+Usage: python -m DesktopAssistant.AtlasPacker
+       python -m DesktopAssistant.AtlasPacker --scales 1 2 Images/Linear=400x400 Images/DialogueBox.png=400x150
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from pathlib import Path
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QPainter
+
+from DesktopAssistant.AssetLoader import get_scaled_size, read_image
+from DesktopAssistant.SpriteAtlas import SpriteAtlas, get_file_hash, get_scale_key, parse_frame_name
+
+# Everything the app loads at a fixed size, as (file or directory, (width, height) it's shown at)
+DEFAULT_SOURCES = [
+    (os.path.join("Images", "Linear"), (400, 400)),
+    (os.path.join("Images", "Linear_Wall"), (400, 400)),
+    (os.path.join("Images", "DialogueBox.png"), (400, 150)),
+]
+
+# Device pixel ratios to make an atlas for. Screens with other ratios resize the loose files on first run
+DEFAULT_SCALES = [1, 1.5, 2]
+
+# Gap left around each sprite so filtering at the edges never picks up its neighbours
+PADDING = 2
+
+
+def arrange(sizes):
+    """
+    Lays sprites out in rows, tallest first, aiming for a roughly square atlas
+    :param sizes: List of (width, height) tuples
+    :return: (list of (x, y) positions in the same order as sizes, (atlas width, atlas height))
+    """
+    total_area = sum((width + PADDING) * (height + PADDING) for width, height in sizes)
+    max_width = max([math.ceil(math.sqrt(total_area))] + [width + PADDING for width, height in sizes])
+
+    positions = [None] * len(sizes)
+    x = y = row_height = atlas_width = 0
+    for index in sorted(range(len(sizes)), key=lambda index: -sizes[index][1]):
+        width, height = sizes[index]
+        if x and x + width + PADDING > max_width:
+            x = 0
+            y += row_height
+            row_height = 0
+
+        positions[index] = (x, y)
+        x += width + PADDING
+        row_height = max(row_height, height + PADDING)
+        atlas_width = max(atlas_width, x)
+
+    return positions, (atlas_width, y + row_height)
+
+
+def get_atlas_path(manifest_path, scale):
+    """
+    :return: Path of the atlas image for a scale, such as atlas.png or atlas@2x.png
+    """
+    suffix = "" if scale == 1 else f"@{get_scale_key(scale)}x"
+    return manifest_path.with_name(f"{manifest_path.stem}{suffix}.png")
+
+
+def write_temp_file(path, write):
+    """
+    Writes a file under a temporary name next to where it's going, so it can be swapped in with os.replace
+    :param path: Path the file is for
+    :param write: Function taking the temporary path that writes the file there
+    :return: The temporary Path
+    :raises OSError: If it couldn't be written
+    """
+    temp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        write(temp_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return temp_path
+
+
+def save_atlas(atlas, path):
+    if not atlas.save(str(path), "PNG", quality=0):
+        raise OSError(f"Couldn't write {path}")
+
+
+def pack(sources, scales, manifest_path):
+    """
+    Packs every PNG in the given files and directories into one atlas for each scale
+    :param sources: List of (file or directory, (width, height)) tuples, they have to be inside the manifest's
+    folder
+    :param scales: Device pixel ratios to make atlases for
+    :param manifest_path: Where to write the manifest, the atlas images go next to it
+    :return: Number of sprites packed
+    """
+    manifest_path = Path(manifest_path)
+    base_dir = manifest_path.parent
+
+    sprites = []
+    manifest_directories = {}
+    for source, size in sources:
+        if Path(source).is_file():
+            sprites.append((Path(source), size))
+            continue
+
+        name = Path(os.path.relpath(source, base_dir)).as_posix()
+        files = sorted(path.name for path in Path(source).glob("*.png"))
+        frames = []
+        for filename in files:
+            sprites.append((Path(source) / filename, size))
+            parsed = parse_frame_name(filename)
+            if parsed is not None:
+                frames.append([f"{name}/{filename}", *parsed])
+        manifest_directories[name] = {"files": files, "frames": frames}
+
+    manifest_sprites = {}
+    for path, size in sprites:
+        name = Path(os.path.relpath(path, base_dir)).as_posix()
+        manifest_sprites[name] = {"size": list(size), "rects": {}, "source_hash": get_file_hash(path)}
+
+    # Every file is written under a temporary name first, (temporary path, path) tuples
+    replacements = []
+    try:
+        manifest = {
+            "version": SpriteAtlas.VERSION,
+            "scales": pack_atlases(sprites, scales, manifest_path, manifest_sprites, replacements),
+            "sprites": manifest_sprites,
+            "directories": manifest_directories,
+        }
+        text = json.dumps(manifest, indent=2) + "\n"
+        replacements.append((write_temp_file(manifest_path, lambda path: path.write_text(text, encoding="utf-8")),
+                             manifest_path))
+    except BaseException:
+        for temp_path, path in replacements:
+            temp_path.unlink(missing_ok=True)
+        raise
+
+    # Nothing is replaced until everything's written, and the manifest goes last. A pack that's cut off part
+    # way leaves the old atlases and manifest alone, only stopping in the middle of the renames themselves
+    # could leave the old manifest next to new atlases
+    for temp_path, path in replacements:
+        os.replace(temp_path, path)
+    return len(sprites)
+
+
+def pack_atlases(sprites, scales, manifest_path, manifest_sprites, replacements):
+    """
+    Draws the atlas for each scale and writes it under a temporary name
+    :param sprites: List of (path, (width, height)) tuples
+    :param manifest_sprites: Manifest entry of each sprite, filled in with its rects
+    :param replacements: List the (temporary path, path) tuples of the atlases are added to
+    :return: Dictionary of scale key to the manifest entry for its atlas
+    """
+    base_dir = manifest_path.parent
+
+    # Each scale gets its own layout, so every rect lands on whole pixels
+    manifest_scales = {}
+    for scale in scales:
+        scaled_sizes = [get_scaled_size(size, scale) for path, size in sprites]
+        positions, atlas_size = arrange(scaled_sizes)
+        atlas = QImage(*atlas_size, QImage.Format.Format_ARGB32_Premultiplied)
+        atlas.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(atlas)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        for (path, size), scaled_size, (x, y) in zip(sprites, scaled_sizes, positions):
+            # Same decode the asset loader does, so packed sprites match loose ones exactly
+            painter.drawImage(x, y, read_image(path, scaled_size))
+
+            name = Path(os.path.relpath(path, base_dir)).as_posix()
+            manifest_sprites[name]["rects"][get_scale_key(scale)] = [x, y, *scaled_size]
+
+        painter.end()
+
+        atlas_path = get_atlas_path(manifest_path, scale)
+        replacements.append((write_temp_file(atlas_path, lambda path: save_atlas(atlas, path)), atlas_path))
+        manifest_scales[get_scale_key(scale)] = {"image": atlas_path.name, "size": list(atlas_size)}
+
+    return manifest_scales
+
+
+def parse_source(value):
+    """
+    Reads a source argument in the form PATH or PATH=WIDTHxHEIGHT
+    """
+    path, _, size = value.partition("=")
+    if not size:
+        return path, (400, 400)
+    width, height = size.lower().split("x")
+    return path, (int(width), int(height))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packs the character art into sprite atlases")
+    parser.add_argument("sources", nargs="*", type=parse_source,
+                        help="Files or directories to pack as PATH=WIDTHxHEIGHT, 400x400 if the size is left off. "
+                             "Defaults to the character art and dialogue box")
+    parser.add_argument("--scales", nargs="+", type=float, default=DEFAULT_SCALES,
+                        help="Device pixel ratios to make an atlas for")
+    parser.add_argument("--output", default=SpriteAtlas.MANIFEST, help="Manifest to write")
+    args = parser.parse_args()
+
+    count = pack(args.sources or DEFAULT_SOURCES, args.scales, args.output)
+    scales = ", ".join(f"{get_scale_key(scale)}x" for scale in args.scales)
+    print(f"Packed {count} sprites into atlases for {scales}, manifest at {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Measures startup, asset loading, per frame rendering and memory under the offscreen platform, then compares
+the results against a saved baseline so slowdowns are caught before a release.
+
+Usage: python -m DesktopAssistant.Benchmark --output results.json
+       python -m DesktopAssistant.Benchmark --update-baseline
+
+Timings only mean something on the machine they were taken on, so the baseline isn't committed. Record one with
+--update-baseline on the commit a change starts from, see the readme.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# The widgets need a platform before QApplication is made, and there's no window to show
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QAbstractAnimation, QCoreApplication
+from PyQt6.QtWidgets import QApplication, QWidget
+
+from DesktopAssistant.AssetLoader import IMAGE_READERS, get_asset_loader, get_scaled_size
+from DesktopAssistant.AtlasPacker import DEFAULT_SCALES, DEFAULT_SOURCES
+from DesktopAssistant.BreakReminderWidget import BreakReminderWidget
+from DesktopAssistant.ConfigReader import ConfigReader
+from DesktopAssistant.DialogueWidget import DialogueWidget
+from DesktopAssistant.ImageCache import image_cache
+from DesktopAssistant.LinearAnimatedBreak import LinearAnimatedBreak
+from DesktopAssistant.SpriteCache import sprite_cache
+
+BASELINE_FILE = "benchmark-baseline.json"
+
+
+def get_peak_rss():
+    """
+    :return: Peak resident memory of this process in bytes, or None if it can't be found on this platform
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # Linux reports kilobytes, macOS reports bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return None
+
+
+def summarize(samples):
+    """
+    :param samples: List of timings in seconds
+    :return: Dictionary of median, p95 and mean in milliseconds
+    """
+    samples = sorted(samples)
+    return {
+        "median_ms": statistics.median(samples) * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        "mean_ms": statistics.mean(samples) * 1000,
+    }
+
+
+def time_call(function, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def measure_import_time(module, runs=5):
+    """
+    Imports a module in fresh interpreters so nothing is already loaded
+    :param module: Module to import
+    :param runs: How many interpreters to average over
+    :return: Median import time in milliseconds
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples) * 1000
+
+
+def measure_construction(config, cold):
+    """
+    Times building each widget and how long until all of its art has arrived
+    :param config: ConfigReader to hand to the widgets
+    :param cold: Whether to start from an empty sprite cache
+    :return: Dictionary of timings in milliseconds
+    """
+    results = {}
+    original_cache_dir = sprite_cache.cache_dir
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if cold:
+            sprite_cache.cache_dir = Path(cache_dir)
+
+        for name, create in [
+            ("LinearAnimatedBreak", lambda: LinearAnimatedBreak(600, 600, os.path.join("Images", "Linear"))),
+            ("DialogueWidget", lambda: DialogueWidget(600, 600)),
+            ("BreakReminderWidget", lambda: BreakReminderWidget(600, 600, config)),
+        ]:
+            image_cache.clear()
+            start = time.perf_counter()
+            widget = create()
+            constructed = time.perf_counter()
+            get_asset_loader().wait_for_done()
+            loaded = time.perf_counter()
+
+            results[name] = {"construct_ms": (constructed - start) * 1000, "assets_ready_ms": (loaded - start) * 1000}
+            widget.deleteLater()
+
+    sprite_cache.cache_dir = original_cache_dir
+    return results
+
+
+def measure_frames(config, iterations):
+    """
+    Times the per frame work of the break animation and the mood switches
+    :return: Dictionary of timing summaries
+    """
+    widget = BreakReminderWidget(600, 600, config)
+    break_portrait = widget.break_portrait
+    break_portrait.prefetch_frames()
+    get_asset_loader().wait_for_done()
+
+    return {
+        "LinearAnimatedBreak.update_image": time_call(break_portrait.update_image, iterations),
+        "LinearAnimatedBreak.animation_update": time_call(break_portrait.animation_update, iterations),
+        "BreakReminderWidget.update_image": time_call(lambda: widget.update_image("head_happy.png"), iterations),
+    }
+
+
+def wait_for_animation(animation):
+    while animation.state() != QAbstractAnimation.State.Stopped:
+        QCoreApplication.processEvents()
+        time.sleep(0.001)
+
+
+def measure_slide_cycle(config):
+    """
+    Times a full slide in and out. Wall time mostly follows the configured durations, the CPU time is what
+    the slides actually cost
+    :return: Dictionary of wall and CPU time in milliseconds
+    """
+    window = QWidget()
+    widget = BreakReminderWidget(600, 600, config, parent=window)
+    get_asset_loader().wait_for_done()
+    window.show()
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    widget.show_scene()
+    wait_for_animation(widget.character_slide_enter_anim_group)
+    widget.hide_scene()
+    wait_for_animation(widget.character_slide_exit_anim_group)
+
+    return {"wall_ms": (time.perf_counter() - wall_start) * 1000, "cpu_ms": (time.process_time() - cpu_start) * 1000}
+
+
+def decode_all_art(backend):
+    """
+    Decodes every packed sprite at every atlas scale with one image backend, skipping the caches, and prints
+    the time it took and the peak memory as JSON. Run in its own interpreter by measure_image_backend
+    :param backend: Name of the image reader to use, "qt" or "pil"
+    """
+    read = IMAGE_READERS[backend]
+    sprites = []
+    for source, size in DEFAULT_SOURCES:
+        paths = [Path(source)] if Path(source).is_file() else sorted(Path(source).glob("*.png"))
+        sprites += [(path, size) for path in paths]
+
+    start = time.perf_counter()
+    for scale in DEFAULT_SCALES:
+        for path, size in sprites:
+            if read(path, get_scaled_size(size, scale)) is None:
+                raise RuntimeError(f"The {backend} image backend isn't available")
+    decode_ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({"decode_ms": decode_ms, "peak_rss_bytes": get_peak_rss()}))
+
+
+def measure_image_backend(backend, imports):
+    """
+    Compares image backends in fresh interpreters, so neither one's imports or memory count against the other
+    :param backend: Name of the image reader to use
+    :param imports: Modules the backend needs on top of the asset loader
+    :return: Dictionary of import time, decode time and peak memory, or None if the backend isn't installed
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    code = f"from DesktopAssistant.Benchmark import decode_all_art; decode_all_art({backend!r})"
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    if output.returncode != 0:
+        print(f"Skipping the {backend} image backend: {output.stderr.strip().splitlines()[-1]}")
+        return None
+
+    results = json.loads(output.stdout.strip().splitlines()[-1])
+    results["import_ms"] = measure_import_time(", ".join(["DesktopAssistant.AssetLoader"] + imports))
+    return results
+
+
+def run_benchmarks(iterations, skip_slide):
+    results = {"import_ms": {module: measure_import_time(module) for module in
+                             ["DesktopAssistant.DesktopAssistantGUI", "DesktopAssistant.BreakReminderWidget",
+                              "DesktopAssistant.LinearAnimatedBreak", "DesktopAssistant.DialogueWidget",
+                              "DesktopAssistant.ConfigReader"]}}
+
+    results["image_backends"] = {"qt": measure_image_backend("qt", []),
+                                 "pil": measure_image_backend("pil", ["PIL.Image", "PIL.ImageQt"])}
+
+    config = ConfigReader(save_state=False)
+    results["construction_cold"] = measure_construction(config, cold=True)
+
+    # Run once first so the sprite cache is filled in even on a fresh checkout
+    measure_construction(config, cold=False)
+    results["construction_warm"] = measure_construction(config, cold=False)
+    results["frames"] = measure_frames(config, iterations)
+    if not skip_slide:
+        results["slide_cycle"] = measure_slide_cycle(config)
+    results["peak_rss_bytes"] = get_peak_rss()
+    return results
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """
+    Finds every measurement that got worse than the baseline by more than the tolerance. Everything
+    measured is a time or a size, so bigger is always worse
+    :param min_delta: Timing changes smaller than this many milliseconds are treated as noise
+    :return: List of (name, baseline value, new value) tuples
+    """
+    current = flatten(results)
+    regressions = []
+    for name, old_value in flatten(baseline).items():
+        new_value = current.get(name)
+        if new_value is None or old_value <= 0 or new_value <= old_value * (1 + tolerance):
+            continue
+        if name.endswith("_ms") and new_value - old_value < min_delta:
+            continue
+        regressions.append((name, old_value, new_value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks startup, asset loading, rendering and memory")
+    parser.add_argument("--output", help="File to write the results to as JSON")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline results to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Save these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="How much worse than the baseline is allowed")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Smallest timing change in ms that counts")
+    parser.add_argument("--iterations", type=int, default=500, help="Calls to time for each per frame measurement")
+    parser.add_argument("--skip-slide", action="store_true", help="Skip the slide cycle, which takes a few seconds")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    results = run_benchmarks(args.iterations, args.skip_slide)
+    output = json.dumps(results, indent=2)
+    print(output)
+
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+
+    if args.update_baseline:
+        Path(args.baseline).write_text(output, encoding="utf-8")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).exists():
+        print(f"No baseline at {args.baseline}, run with --update-baseline to make one")
+        return 0
+
+    regressions = compare(results, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.tolerance,
+                          args.min_delta)
+    for name, old_value, new_value in regressions:
+        print(f"Regression: {name} went from {old_value:.3f} to {new_value:.3f}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,232 +1,521 @@
-import os
-
-from PIL import Image
-from PIL.ImageQt import ImageQt
-
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtWidgets import QLabel, QWidget, QProgressBar
-from PyQt6.QtCore import Qt, QPropertyAnimation, QPoint, QSequentialAnimationGroup, QTimer, QEasingCurve, \
-    QParallelAnimationGroup
-
-from DesktopAssistant.LinearAnimatedBreak import LinearAnimatedBreak
-from DesktopAssistant.DesktopButton import DesktopButton
-from DesktopAssistant.DialogueWidget import DialogueWidget
-
-
-class BreakReminderWidget(QWidget):
-    """
-    Handles the animation of linear leaning in and asking the user to take a break
-    """
-    SLIDE_DURATION = 2_000
-    work_count = 0
-
-    dialogue_box = None
-    dialogue_fade_in_animation = None
-    dialogue_fade_out_animation = None
-    active_timer = QTimer()
-    stand_timer = QTimer()
-
-    def __init__(self, width, height, config, *args, **kwargs):
-        super(BreakReminderWidget, self).__init__(*args, **kwargs)
-
-        self.config = config
-        self.active_timer.setSingleShot(True)
-        self.stand_timer.setSingleShot(True)
-        self.stand_timer.timeout.connect(self.show_stand_dialog)
-
-        # Set our widget to the size specified
-        self.width = width
-        self.height = height
-        self.resize(self.width, self.height)
-
-        # Load and create the main character image
-        image = Image.open(os.path.join("Images", "Linear_Wall", "head.png"))
-        image = image.resize((400, 400))
-        self.main_character_image_label = QLabel(parent=self)
-        self.main_character_image_label.setPixmap(QPixmap.fromImage(ImageQt(image)))
-        self.main_character_image_label.move(600, 200)
-
-        # Load and create the hands image
-        image = Image.open(os.path.join("Images", "Linear_Wall", "hands.png"))
-        image = image.resize((400, 400))
-        self.hands_character_image_label = QLabel(parent=self)
-        self.hands_character_image_label.setPixmap(QPixmap.fromImage(ImageQt(image)))
-        self.hands_character_image_label.move(600, 200)
-
-        # Create main body slide
-        self.main_character_slide_in_anim = QPropertyAnimation(self.main_character_image_label, b"pos")
-        self.main_character_slide_in_anim.setEndValue(QPoint(200, 200))
-        self.main_character_slide_in_anim.setDuration(self.SLIDE_DURATION)
-        self.main_character_slide_in_anim.setEasingCurve(QEasingCurve.Type.OutCubic)
-
-        self.main_character_slide_out_anim = QPropertyAnimation(self.main_character_image_label, b"pos")
-        self.main_character_slide_out_anim.setEndValue(QPoint(600, 200))
-        self.main_character_slide_out_anim.setDuration(self.SLIDE_DURATION)
-        self.main_character_slide_out_anim.setEasingCurve(QEasingCurve.Type.InCubic)
-
-        # Create hand slide
-        self.hands_character_slide_in_anim = QPropertyAnimation(self.hands_character_image_label, b"pos")
-        self.hands_character_slide_in_anim.setEndValue(QPoint(200, 200))
-        self.hands_character_slide_in_anim.setDuration(self.SLIDE_DURATION)
-        self.hands_character_slide_in_anim.setEasingCurve(QEasingCurve.Type.OutCubic)
-
-        self.hands_character_slide_out_anim = QPropertyAnimation(self.hands_character_image_label, b"pos")
-        self.hands_character_slide_out_anim.setEndValue(QPoint(600, 200))
-        self.hands_character_slide_out_anim.setDuration(self.SLIDE_DURATION)
-        self.hands_character_slide_out_anim.setEasingCurve(QEasingCurve.Type.InCubic)
-
-        # Create the break animated portrait
-        self.break_portrait = LinearAnimatedBreak(self.width, self.height, os.path.join("Images", "Linear"),
-                                                  parent=self)
-        self.break_portrait.hide()
-
-        # Create the dialogue box
-        self.dialogue_box = DialogueWidget(self.width, self.height, parent=self)
-        self.create_startup_dialog_box()
-
-        # Create dialogue box show animation
-        self.dialogue_fade_in_animation = QPropertyAnimation(self.dialogue_box, b"pos")
-        self.dialogue_fade_in_animation.setEndValue(QPoint(0, 0))
-        self.dialogue_fade_in_animation.setDuration(1000)
-        self.dialogue_fade_in_animation.setEasingCurve(QEasingCurve.Type.OutCubic)
-
-        self.dialogue_fade_out_animation = QPropertyAnimation(self.dialogue_box, b"pos")
-        self.dialogue_fade_out_animation.setEndValue(QPoint(0, -200))
-        self.dialogue_fade_out_animation.setDuration(1000)
-        self.dialogue_fade_out_animation.setEasingCurve(QEasingCurve.Type.InCubic)
-
-        # Create a sequential animation slide group
-        self.character_slide_enter_anim_group = QSequentialAnimationGroup()
-        self.character_slide_enter_anim_group.addAnimation(self.hands_character_slide_in_anim)
-        self.character_slide_enter_anim_group.addAnimation(self.main_character_slide_in_anim)
-        self.character_slide_enter_anim_group.addAnimation(self.dialogue_fade_in_animation)
-
-        self.character_slide_exit_anim_group = QParallelAnimationGroup()
-        self.character_slide_exit_anim_group.addAnimation(self.hands_character_slide_out_anim)
-        self.character_slide_exit_anim_group.addAnimation(self.main_character_slide_out_anim)
-        self.character_slide_exit_anim_group.addAnimation(self.dialogue_fade_out_animation)
-
-        # Create a break progress bar
-        self.break_progress_bar = QProgressBar(parent=self)
-        self.break_progress_bar.resize(self.width - 200, 15)
-        self.break_progress_bar.move(200, self.height - 15)
-        self.break_progress_bar.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.break_progress_bar.setFormat("")
-        self.break_progress_bar_animation = QPropertyAnimation(self.break_progress_bar, b"value")
-        self.break_progress_bar_animation.setEndValue(100)
-        self.break_progress_bar_animation.setDuration(self.config.get_break_length())
-        self.break_progress_bar.hide()
-
-    def create_break_dialog_box(self):
-        # Create a dialogue box
-        buttons = [DesktopButton("Take Break", self.begin_break),
-                   DesktopButton("Snooze", self.begin_snooze),
-                   DesktopButton("Just Starting", self.begin_work)]
-
-        self.dialogue_box.set_buttons(buttons)
-        self.dialogue_box.set_dialogue(self.config.get_break_prompt_text())
-
-    def create_startup_dialog_box(self):
-        # Create a dialogue box
-        buttons = [DesktopButton("Start", self.begin_work)]
-
-        self.dialogue_box.set_buttons(buttons)
-        self.dialogue_box.set_dialogue(self.config.get_work_start_text())
-
-    def create_stand_dialog_box(self):
-        # Create a dialogue box
-        buttons = [DesktopButton("Fine...", self.hide_scene)]
-
-        self.dialogue_box.set_buttons(buttons)
-        self.dialogue_box.set_dialogue(self.config.get_stand_up_text())
-
-    def show_start_dialog(self):
-        self.update_image_default()
-
-        # Set the image back and hide the progress bar
-        image = Image.open(os.path.join("Images", "Linear_Wall", "head.png"))
-        image = image.resize((400, 400))
-        self.main_character_image_label.setPixmap(QPixmap.fromImage(ImageQt(image)))
-
-        self.break_progress_bar.hide()
-
-        self.create_startup_dialog_box()
-        self.show_scene()
-
-    def show_break_dialog(self):
-        self.create_break_dialog_box()
-
-        # Stop any active timers in case we skipped here manually
-        self.active_timer.stop()
-
-        self.show_scene()
-
-    def show_stand_dialog(self):
-        self.update_image_happy()
-        self.create_stand_dialog_box()
-        self.show_scene()
-
-    def begin_work(self):
-        self.update_image_happy()
-        self.work_count += 1
-
-        if self.config.get_stand_frequency() > 0 and self.work_count % self.config.get_stand_frequency() == 0:
-            self.schedule_stand_notification()
-
-        self.hide_scene()
-        self.active_timer.timeout.connect(self.show_break_dialog)
-        self.active_timer.start(self.config.get_work_length())
-
-    def begin_snooze(self):
-        self.update_image_sad()
-        self.hide_scene()
-        self.active_timer.timeout.connect(self.show_break_dialog)
-        self.active_timer.start(self.config.get_break_length())
-
-    def begin_break(self):
-        self.break_portrait.show()
-        self.main_character_image_label.hide()
-        self.hands_character_image_label.hide()
-        self.break_progress_bar.show()
-        self.break_progress_bar.setValue(0)
-        self.break_progress_bar_animation.start()
-        self.dialogue_box.hide()
-
-        self.active_timer.timeout.disconnect()
-        self.active_timer.timeout.connect(self.show_start_dialog)
-        self.active_timer.start(self.config.get_break_length())
-
-    def schedule_stand_notification(self):
-        start_time = self.config.get_work_length() - self.config.get_stand_length()
-        self.stand_timer.start(start_time)
-
-    def show_scene(self):
-        self.break_portrait.hide()
-        self.main_character_image_label.move(600, 200)
-        self.main_character_image_label.show()
-        self.hands_character_image_label.move(600, 200)
-        self.hands_character_image_label.show()
-        self.dialogue_box.move(0, -200)
-        self.dialogue_box.show()
-        self.character_slide_enter_anim_group.start()
-
-    def hide_scene(self):
-        self.break_portrait.hide()
-        self.main_character_image_label.move(200, 200)
-        self.hands_character_image_label.move(200, 200)
-        self.dialogue_box.move(0, 0)
-        self.character_slide_exit_anim_group.start()
-
-    def update_image_happy(self):
-        self.update_image("head_happy.png")
-
-    def update_image_default(self):
-        self.update_image("head.png")
-
-    def update_image_sad(self):
-        self.update_image("head_sad.png")
-
-    def update_image(self, image_name):
-        image = Image.open(os.path.join("Images", "Linear_Wall", image_name))
-        image = image.resize((400, 400))
-        self.main_character_image_label.setPixmap(QPixmap.fromImage(ImageQt(image)))
+from datetime import date
+
+from PyQt6.QtWidgets import QLabel, QWidget, QProgressBar
+from PyQt6.QtCore import Qt, QPoint, QSequentialAnimationGroup, QTimer, QEasingCurve, QParallelAnimationGroup, \
+    QElapsedTimer, pyqtSignal
+
+from DesktopAssistant.CappedPropertyAnimation import CappedPropertyAnimation
+from DesktopAssistant.ImageCache import image_cache
+from DesktopAssistant.LinearAnimatedBreak import LinearAnimatedBreak
+from DesktopAssistant.DesktopButton import DesktopButton
+from DesktopAssistant.Diagnostics import diagnostics
+from DesktopAssistant.DialogueWidget import DialogueWidget
+from DesktopAssistant.SceneCompositor import ProgressLayer, SceneCompositor, SceneLayer
+from DesktopAssistant.SessionScheduler import SessionScheduler
+from DesktopAssistant.SpriteAtlas import get_sprite_key
+from DesktopAssistant.ThemePack import find_pack
+
+
+class BreakReminderWidget(QWidget):
+    """
+    Handles the animation of linear leaning in and asking the user to take a break
+    """
+    SLIDE_DURATION = 2_000
+    DIALOGUE_SLIDE_DURATION = 1_000
+
+    # How much of the slide durations to use for each SLIDE_ANIMATIONS config setting
+    SLIDE_SCALES = {"FULL": 1, "SHORT": 0.25, "OFF": 0}
+
+    # Only one of these runs at a time, they decide when the scene next slides in
+    ACTIVE_DEADLINES = [SessionScheduler.WORK, SessionScheduler.SNOOZE, SessionScheduler.BREAK]
+
+    # States sent out through state_changed whenever the session moves along
+    STATE_START_PROMPT = "start_prompt"
+    STATE_BREAK_PROMPT = "break_prompt"
+    STATE_STAND_PROMPT = "stand_prompt"
+    STATE_WORK = "work"
+    STATE_SNOOZE = "snooze"
+    STATE_BREAK = "break"
+
+    # Sent instead of STATE_WORK when the stand prompt is dismissed, since that goes back to the sprint that was
+    # already running rather than starting another one
+    EVENT_STAND_DISMISSED = "stand_dismissed"
+
+    state_changed = pyqtSignal(str)
+
+    dialogue_box = None
+    dialogue_fade_in_animation = None
+    dialogue_fade_out_animation = None
+
+    def __init__(self, width, height, config, *args, scheduler=None, rng=None, pack=None, leader=None, **kwargs):
+        """
+        :param pack: ThemePack to show, or None for the one set in the config
+        :param leader: BreakReminderWidget to mirror, such as the one on the primary screen. Mirrors show
+        whatever the leader's session is doing and pass their button presses to it, sharing its scheduler
+        and art instead of keeping their own
+        """
+        super(BreakReminderWidget, self).__init__(*args, **kwargs)
+
+        # The leader runs the session, mirrors only ever show it
+        self.leader = leader
+        self.session = leader or self
+        self.mirrors = []
+
+        self.config = config
+        self.pack = leader.pack if leader else pack or find_pack(self.config.get_theme_pack())
+        self.pack.activate()
+        image_cache.set_max_bytes(self.config.get_art_memory_budget())
+
+        # Carry on counting from earlier today if the app was restarted
+        self.work_count = 0
+        if self.config.get_last_cycle_date() == date.today().isoformat():
+            self.work_count = self.config.get_work_count()
+        self.current_dialog_box = None
+
+        # Which of the STATE_* names the session is in, it always opens on the start prompt
+        self.state = self.STATE_START_PROMPT
+
+        # Every deadline goes through the one scheduler, and each callback is only ever hooked up once
+        if leader:
+            self.scheduler = leader.scheduler
+        else:
+            self.scheduler = scheduler or SessionScheduler(parent=self)
+            self.scheduler.set_callback(SessionScheduler.WORK,
+                                        diagnostics.wrap("timer.work", self.show_break_dialog))
+            self.scheduler.set_callback(SessionScheduler.SNOOZE,
+                                        diagnostics.wrap("timer.snooze", self.show_break_dialog))
+            self.scheduler.set_callback(SessionScheduler.BREAK,
+                                        diagnostics.wrap("timer.break", self.show_start_dialog))
+            self.scheduler.set_callback(SessionScheduler.STAND,
+                                        diagnostics.wrap("timer.stand", self.show_stand_dialog))
+            if diagnostics.enabled:
+                self.scheduler.deadline_fired.connect(
+                    lambda name, lateness: diagnostics.record("timer.lag", lateness))
+
+        # Set our widget to the size specified
+        self.width = width
+        self.height = height
+        self.resize(self.width, self.height)
+
+        # With the composited renderer the images are layers drawn by one widget instead of separate labels.
+        # Layers act like labels, so the rest of the scene doesn't need to care which it has
+        self.compositor = None
+        if self.config.get_scene_renderer() == "COMPOSITED":
+            self.compositor = SceneCompositor(parent=self)
+            self.compositor.resize(self.width, self.height)
+
+        # Create the main character and hands images. These are needed for the first scene, so they're
+        # decoded first and the scene waits on them before sliding in
+        self.main_character_image_label = self.create_image_label()
+        self.main_character_image_label.move(600, 200)
+        self.hands_character_image_label = self.create_image_label()
+        self.hands_character_image_label.move(600, 200)
+        self.set_head_pixmap = diagnostics.wrap("scene.pixmap_swap", self.main_character_image_label.setPixmap)
+
+        self.current_head_image = "head.png"
+        self.wall_images_loaded = False
+        self.show_scene_pending = False
+        self.update_image(self.current_head_image)
+        self.load_hands_image()
+        self.preload_wall_images()
+
+        # Create main body slide. Durations and frame rate caps come from the power profile,
+        # see apply_power_profile
+        self.main_character_slide_in_anim = CappedPropertyAnimation(self.main_character_image_label, b"pos")
+        self.main_character_slide_in_anim.setEndValue(QPoint(200, 200))
+        self.main_character_slide_in_anim.setEasingCurve(QEasingCurve.Type.OutCubic)
+
+        self.main_character_slide_out_anim = CappedPropertyAnimation(self.main_character_image_label, b"pos")
+        self.main_character_slide_out_anim.setEndValue(QPoint(600, 200))
+        self.main_character_slide_out_anim.setEasingCurve(QEasingCurve.Type.InCubic)
+
+        # Create hand slide
+        self.hands_character_slide_in_anim = CappedPropertyAnimation(self.hands_character_image_label, b"pos")
+        self.hands_character_slide_in_anim.setEndValue(QPoint(200, 200))
+        self.hands_character_slide_in_anim.setEasingCurve(QEasingCurve.Type.OutCubic)
+
+        self.hands_character_slide_out_anim = CappedPropertyAnimation(self.hands_character_image_label, b"pos")
+        self.hands_character_slide_out_anim.setEndValue(QPoint(600, 200))
+        self.hands_character_slide_out_anim.setEasingCurve(QEasingCurve.Type.InCubic)
+
+        # Create the break animated portrait. Its frames are only loaded once a break is coming up
+        self.break_portrait = LinearAnimatedBreak(self.width, self.height, self.pack.frames_dir, parent=self,
+                                                  rng=rng, compositor=self.compositor, preload=False,
+                                                  leader=leader.break_portrait if leader else None)
+        self.break_portrait.hide()
+
+        # Create the dialogue box
+        self.dialogue_box = DialogueWidget(self.width, self.height, parent=self,
+                                           background_path=self.pack.dialogue_box_path)
+        self.create_startup_dialog_box()
+
+        # Create dialogue box show animation
+        self.dialogue_fade_in_animation = CappedPropertyAnimation(self.dialogue_box, b"pos")
+        self.dialogue_fade_in_animation.setEndValue(QPoint(0, 0))
+        self.dialogue_fade_in_animation.setEasingCurve(QEasingCurve.Type.OutCubic)
+
+        self.dialogue_fade_out_animation = CappedPropertyAnimation(self.dialogue_box, b"pos")
+        self.dialogue_fade_out_animation.setEndValue(QPoint(0, -200))
+        self.dialogue_fade_out_animation.setEasingCurve(QEasingCurve.Type.InCubic)
+
+        # Create a sequential animation slide group
+        self.character_slide_enter_anim_group = QSequentialAnimationGroup()
+        self.character_slide_enter_anim_group.addAnimation(self.hands_character_slide_in_anim)
+        self.character_slide_enter_anim_group.addAnimation(self.main_character_slide_in_anim)
+        self.character_slide_enter_anim_group.addAnimation(self.dialogue_fade_in_animation)
+
+        self.character_slide_exit_anim_group = QParallelAnimationGroup()
+        self.character_slide_exit_anim_group.addAnimation(self.hands_character_slide_out_anim)
+        self.character_slide_exit_anim_group.addAnimation(self.main_character_slide_out_anim)
+        self.character_slide_exit_anim_group.addAnimation(self.dialogue_fade_out_animation)
+
+        # Create a break progress bar
+        if self.compositor:
+            self.break_progress_bar = ProgressLayer(self.compositor)
+        else:
+            self.break_progress_bar = QProgressBar(parent=self)
+        self.break_progress_bar.resize(self.width - 200, 15)
+        self.break_progress_bar.move(200, self.height - 15)
+        self.break_progress_bar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.break_progress_bar.setFormat("")
+        self.break_progress_bar.hide()
+
+        # The break is long, so the progress bar only steps forward every so often instead of animating
+        self.break_progress_elapsed = QElapsedTimer()
+        self.break_progress_timer = QTimer()
+        self.break_progress_timer.timeout.connect(diagnostics.wrap("timer.progress", self.update_break_progress))
+
+        self.apply_power_profile()
+
+        if leader:
+            leader.mirrors.append(self)
+            self.catch_up(leader.state)
+
+    def create_image_label(self):
+        if self.compositor:
+            return SceneLayer(self.compositor)
+        return QLabel(parent=self)
+
+    def apply_power_profile(self):
+        """
+        Applies the power settings from the config to every animation in the scene
+        """
+        max_fps = self.config.get_max_animation_fps()
+        slide_scale = self.SLIDE_SCALES.get(self.config.get_slide_animations(), 1)
+
+        for animation in [self.main_character_slide_in_anim, self.main_character_slide_out_anim,
+                          self.hands_character_slide_in_anim, self.hands_character_slide_out_anim]:
+            animation.set_max_fps(max_fps)
+            animation.setDuration(int(self.SLIDE_DURATION * slide_scale))
+
+        for animation in [self.dialogue_fade_in_animation, self.dialogue_fade_out_animation]:
+            animation.set_max_fps(max_fps)
+            animation.setDuration(int(self.DIALOGUE_SLIDE_DURATION * slide_scale))
+
+        self.break_progress_timer.setInterval(self.config.get_progress_update_interval())
+        self.break_portrait.set_power_profile(max_fps, self.config.get_blink_min(), self.config.get_blink_max())
+
+    def apply_config(self):
+        """
+        Picks up a reloaded config. Power settings and the showing dialogue change right away, new timings
+        are used from the next work, snooze or break onwards
+        """
+        self.apply_power_profile()
+        image_cache.set_max_bytes(self.config.get_art_memory_budget())
+        self.current_dialog_box()
+        for mirror in self.mirrors:
+            mirror.apply_config()
+
+    def set_pack(self, pack):
+        """
+        Switches to another theme pack's art. Whatever is on screen keeps showing the old art until the new
+        art has loaded, then the old pack's art is dropped from the cache
+        :param pack: ThemePack to switch to
+        """
+        if pack is self.pack:
+            return
+
+        old_pack = self.pack
+        self.pack = pack
+        self.pack.activate()
+
+        self.update_image(self.current_head_image)
+        self.load_hands_image()
+        self.preload_wall_images()
+        self.break_portrait.set_image_dir(self.pack.frames_dir)
+        self.dialogue_box.set_background(self.pack.dialogue_box_path)
+        for mirror in self.mirrors:
+            mirror.set_pack(pack)
+
+        # Labels hold their own reference to what they're showing, so this only drops the spare copies
+        image_cache.evict_matching(old_pack.contains)
+
+    def reload_images(self, paths):
+        """
+        Picks up art that changed on disk, which AssetWatcher has already dropped from the caches. Only the
+        images that changed are loaded again, and whatever is on screen stays up until its replacement arrives
+        :param paths: Paths of the files that changed
+        """
+        changed = {get_sprite_key(path) for path in paths}
+
+        def is_changed(path):
+            return get_sprite_key(path) in changed
+
+        if is_changed(self.get_wall_image_path(self.current_head_image)):
+            self.update_image(self.current_head_image)
+        if is_changed(self.get_wall_image_path("hands.png")):
+            self.load_hands_image()
+        if is_changed(self.pack.dialogue_box_path):
+            self.dialogue_box.set_background(self.pack.dialogue_box_path)
+
+        self.preload_wall_images()
+        self.break_portrait.reload_files(paths)
+        for mirror in self.mirrors:
+            mirror.reload_images(paths)
+
+    def load_hands_image(self):
+        image_cache.request(self.get_wall_image_path("hands.png"), (400, 400),
+                            lambda pixmap, pack=self.pack: self.set_hands_image(pack, pixmap))
+
+    def preload_wall_images(self):
+        # Warm up the other moods so switching between them never has to wait on the disk
+        image_cache.preload([(self.get_wall_image_path("head_happy.png"), (400, 400)),
+                             (self.get_wall_image_path("head_sad.png"), (400, 400))])
+
+    def update_break_progress(self):
+        elapsed = self.session.break_progress_elapsed.elapsed()
+        progress = min(100, elapsed * 100 // max(1, self.config.get_break_length()))
+        self.break_progress_bar.setValue(progress)
+        if progress >= 100:
+            self.break_progress_timer.stop()
+
+    def get_wall_image_path(self, image_name):
+        return self.pack.get_wall_image_path(image_name)
+
+    def set_hands_image(self, pack, pixmap):
+        # Ignore hands from a pack that was switched away from while they loaded
+        if pack is self.pack:
+            self.hands_character_image_label.setPixmap(pixmap)
+            self.check_wall_images_loaded()
+
+    def check_wall_images_loaded(self):
+        """
+        Starts any scene that was waiting on the head and hands images once both have arrived
+        """
+        if self.wall_images_loaded:
+            return
+        if self.main_character_image_label.pixmap().isNull() or self.hands_character_image_label.pixmap().isNull():
+            return
+
+        self.wall_images_loaded = True
+        if self.show_scene_pending:
+            self.show_scene()
+
+    def create_break_dialog_box(self):
+        # Create a dialogue box
+        self.current_dialog_box = self.create_break_dialog_box
+        buttons = [DesktopButton("Take Break", self.session.begin_break),
+                   DesktopButton("Snooze", self.session.begin_snooze),
+                   DesktopButton("Just Starting", self.session.begin_work)]
+
+        self.dialogue_box.set_buttons(buttons)
+        self.dialogue_box.set_dialogue(self.config.get_break_prompt_text())
+
+    def create_startup_dialog_box(self):
+        # Create a dialogue box
+        self.current_dialog_box = self.create_startup_dialog_box
+        buttons = [DesktopButton("Start", self.session.begin_work)]
+
+        self.dialogue_box.set_buttons(buttons)
+        self.dialogue_box.set_dialogue(self.config.get_work_start_text())
+
+    def create_stand_dialog_box(self):
+        # Create a dialogue box
+        self.current_dialog_box = self.create_stand_dialog_box
+        buttons = [DesktopButton("Fine...", self.session.dismiss_stand_dialog)]
+
+        self.dialogue_box.set_buttons(buttons)
+        self.dialogue_box.set_dialogue(self.config.get_stand_up_text())
+
+    def show_start_dialog(self):
+        self.set_state(self.STATE_START_PROMPT)
+
+    def show_break_dialog(self):
+        # Stop any active timers in case we skipped here manually
+        self.scheduler.cancel(*self.ACTIVE_DEADLINES)
+        self.set_state(self.STATE_BREAK_PROMPT)
+
+    def show_stand_dialog(self):
+        self.set_state(self.STATE_STAND_PROMPT)
+
+    def dismiss_stand_dialog(self):
+        # The work deadline kept running under the prompt, and work_count already counts this sprint
+        self.set_state(self.STATE_WORK, self.EVENT_STAND_DISMISSED)
+
+    def begin_work(self):
+        self.work_count += 1
+        self.config.set_work_count(self.work_count, date.today().isoformat())
+
+        if self.config.get_stand_frequency() > 0 and self.work_count % self.config.get_stand_frequency() == 0:
+            self.schedule_stand_notification()
+
+        self.start_active_deadline(SessionScheduler.WORK, self.config.get_work_length())
+        self.set_state(self.STATE_WORK)
+
+    def begin_snooze(self):
+        self.start_active_deadline(SessionScheduler.SNOOZE, self.config.get_break_length())
+        self.set_state(self.STATE_SNOOZE)
+
+    def begin_break(self):
+        self.break_progress_elapsed.start()
+        self.start_active_deadline(SessionScheduler.BREAK, self.config.get_break_length())
+        self.set_state(self.STATE_BREAK)
+
+    def set_state(self, state, event=None):
+        """
+        Moves the session along, showing the new state on this widget and every mirror
+        :param state: One of the STATE_* names
+        :param event: What to send through state_changed if it isn't just the state, such as
+        EVENT_STAND_DISMISSED
+        """
+        for view in [self] + self.mirrors:
+            view.state = state
+            view.present(state)
+        self.state_changed.emit(event or state)
+
+    def present(self, state):
+        """
+        Shows a state on screen, without touching the session
+        """
+        {
+            self.STATE_START_PROMPT: self.present_start_prompt,
+            self.STATE_BREAK_PROMPT: self.present_break_prompt,
+            self.STATE_STAND_PROMPT: self.present_stand_prompt,
+            self.STATE_WORK: self.present_work,
+            self.STATE_SNOOZE: self.present_snooze,
+            self.STATE_BREAK: self.present_break,
+        }[state]()
+
+    def catch_up(self, state):
+        """
+        Brings a new mirror up to the leader's state. States where the scene is hidden skip the slide out
+        """
+        self.state = state
+        if state in (self.STATE_WORK, self.STATE_SNOOZE):
+            self.update_image(self.leader.current_head_image)
+            self.dialogue_box.hide()
+        else:
+            self.present(state)
+
+    def present_start_prompt(self):
+        # Set the image back and hide the progress bar
+        self.update_image_default()
+        self.break_progress_timer.stop()
+        self.break_progress_bar.hide()
+
+        self.create_startup_dialog_box()
+        self.show_scene()
+
+    def present_break_prompt(self):
+        self.create_break_dialog_box()
+        self.show_scene()
+
+        # Get the break frames decoding while the prompt slides in, so they're ready by the time it's taken
+        self.break_portrait.prefetch_frames()
+
+    def present_stand_prompt(self):
+        self.update_image_happy()
+        self.create_stand_dialog_box()
+        self.show_scene()
+
+    def present_work(self):
+        self.update_image_happy()
+        self.hide_scene()
+
+    def present_snooze(self):
+        self.update_image_sad()
+        self.hide_scene()
+
+    def present_break(self):
+        self.break_portrait.show()
+        self.main_character_image_label.hide()
+        self.hands_character_image_label.hide()
+        self.break_progress_bar.show()
+        self.update_break_progress()
+        self.break_progress_timer.start()
+        self.dialogue_box.hide()
+
+    def remove_mirror(self, mirror):
+        """
+        Stops showing the session on a mirror, such as one on a screen that was unplugged
+        """
+        self.mirrors.remove(mirror)
+        self.break_portrait.remove_mirror(mirror.break_portrait)
+
+    def start_active_deadline(self, name, length):
+        """
+        Replaces whichever work, snooze or break deadline is running with a new one
+        :param name: Deadline name, such as SessionScheduler.WORK
+        :param length: Milliseconds until the deadline
+        """
+        self.scheduler.cancel(*self.ACTIVE_DEADLINES)
+        self.scheduler.schedule(name, length)
+
+    def get_remaining_time(self):
+        """
+        :return: Milliseconds until the running work, snooze or break deadline, or -1 if none are running
+        """
+        for name in self.ACTIVE_DEADLINES:
+            if self.scheduler.is_scheduled(name):
+                return self.scheduler.get_remaining_time(name)
+        return -1
+
+    def schedule_stand_notification(self):
+        start_time = self.config.get_work_length() - self.config.get_stand_length()
+        self.scheduler.schedule(SessionScheduler.STAND, start_time)
+
+    def show_scene(self):
+        # Hold off on sliding in until there's something to show
+        if not self.wall_images_loaded:
+            self.show_scene_pending = True
+            return
+        self.show_scene_pending = False
+
+        # Hiding lets go of the break frames, so leave alone a portrait that's already hidden. Its frames might
+        # be a prefetch for the prompt this scene is sliding in for
+        if not self.break_portrait.isHidden():
+            self.break_portrait.hide()
+        self.main_character_image_label.move(600, 200)
+        self.main_character_image_label.show()
+        self.hands_character_image_label.move(600, 200)
+        self.hands_character_image_label.show()
+        self.dialogue_box.move(0, -200)
+        self.dialogue_box.show()
+        self.character_slide_enter_anim_group.start()
+
+    def hide_scene(self):
+        self.break_portrait.hide()
+        self.main_character_image_label.move(200, 200)
+        self.hands_character_image_label.move(200, 200)
+        self.dialogue_box.move(0, 0)
+        self.character_slide_exit_anim_group.start()
+
+    def update_image_happy(self):
+        self.update_image("head_happy.png")
+
+    def update_image_default(self):
+        self.update_image("head.png")
+
+    def update_image_sad(self):
+        self.update_image("head_sad.png")
+
+    def update_image(self, image_name):
+        self.current_head_image = image_name
+        image_cache.request(self.get_wall_image_path(image_name), (400, 400),
+                            lambda pixmap, pack=self.pack: self.set_head_image(image_name, pack, pixmap))
+
+    def set_head_image(self, image_name, pack, pixmap):
+        # Decodes can finish out of order, so only show the most recently asked for head
+        if image_name == self.current_head_image and pack is self.pack:
+            self.set_head_pixmap(pixmap)
+            self.check_wall_images_loaded()
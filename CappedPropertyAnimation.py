@@ -0,0 +1,43 @@
+import time
+
+from PyQt6.QtCore import QPropertyAnimation
+
+from DesktopAssistant.Diagnostics import diagnostics
+
+
+class CappedPropertyAnimation(QPropertyAnimation):
+    """
+    Property animation that only applies a new value at most max_fps times a second. Qt still drives it
+    from its own animation timer, but skipped updates don't move or repaint anything, which is where the
+    real cost of sliding big translucent images around is.
+    """
+
+    def __init__(self, target, property_name, max_fps=0, *args, **kwargs):
+        super(CappedPropertyAnimation, self).__init__(target, property_name, *args, **kwargs)
+        self.frame_interval = 0
+        self.last_frame_time = None
+        self.last_frame_clock = None
+        self.set_max_fps(max_fps)
+
+    def set_max_fps(self, max_fps):
+        """
+        :param max_fps: Most updates to apply per second, 0 for no limit
+        """
+        self.frame_interval = 1000 / max_fps if max_fps > 0 else 0
+
+    def updateCurrentTime(self, current_time):
+        # Always land exactly on the start and end values, and start counting again if the animation restarts
+        if current_time in (0, self.duration()) or self.last_frame_time is None \
+                or abs(current_time - self.last_frame_time) >= self.frame_interval:
+            self.last_frame_time = current_time
+            if not diagnostics.enabled:
+                super(CappedPropertyAnimation, self).updateCurrentTime(current_time)
+                return
+
+            # Time how long the frame takes, and how long it's been since the last one actually landed
+            start = time.perf_counter()
+            super(CappedPropertyAnimation, self).updateCurrentTime(current_time)
+            diagnostics.record("slide.frame", (time.perf_counter() - start) * 1000)
+            if current_time != 0 and self.last_frame_clock is not None:
+                diagnostics.record("slide.frame_gap", (start - self.last_frame_clock) * 1000)
+            self.last_frame_clock = start
@@ -1,95 +1,361 @@
-import codecs
-import shutil
-from pathlib import Path
-
-
-class ConfigReader:
-    """
-    Simple class for loading saved parameters from a text file. Uses "base-config.txt" for default values,
-    then loads any user values from "local-config.txt"
-    """
-    BASE_CONFIG = "base-config.txt"
-    LOCAL_CONFIG = "local-config.txt"
-
-    def __init__(self):
-        self.values = {}
-
-        # Start by parsing the base config file, then overwriting with any local versions
-        self.parse_config_file(self.BASE_CONFIG)
-        self.parse_config_file(self.LOCAL_CONFIG)
-
-    def parse_config_file(self, filename):
-        if not Path(filename).exists():
-            return
-
-        with codecs.open(filename, encoding="utf-8") as file:
-            for line in file.readlines():
-
-                # If the line is blank or is a comment, ignore
-                if not line.strip() or line.startswith("#"):
-                    continue
-
-                # Split off anything after any # values
-                line = line.split("#")[0]
-
-                if "=" not in line:
-                    print("Error parsing config: line is not parsable:")
-                    print(line)
-                    continue
-
-                key, value = line.split("=", 1)
-                self.values[key.strip()] = value.strip()
-
-    def get_break_length(self):
-        return int(self.values["BREAK_LENGTH"]) * 60 * 1000
-
-    def get_work_length(self):
-        return int(self.values["WORK_LENGTH"]) * 60 * 1000
-
-    def get_stand_frequency(self):
-        return int(self.values["STAND_FREQUENCY"])
-
-    def get_stand_length(self):
-        return int(self.values["STAND_TIME"]) * 60 * 1000
-
-    def get_break_prompt_text(self):
-        return self.values["BREAK_PROMPT_TEXT"].replace("\\n", "\n")
-
-    def get_work_start_text(self):
-        return self.values["WORK_START_TEXT"].replace("\\n", "\n")
-
-    def get_stand_up_text(self):
-        return self.values["STAND_UP_TEXT"].replace("\\n", "\n")
-
-    def get_position_one_offsets(self):
-        offset_x = int(self.values["POSITION_ONE_OFFSET_X"])
-        offset_y = int(self.values["POSITION_ONE_OFFSET_Y"])
-        return offset_x, offset_y
-
-    def get_position_two_offsets(self):
-        offset_x = int(self.values["POSITION_TWO_OFFSET_X"])
-        offset_y = int(self.values["POSITION_TWO_OFFSET_Y"])
-        return offset_x, offset_y
-
-    def get_saved_position(self):
-        return int(self.values["CURRENT_POSITION"])
-
-    def set_current_position(self, value):
-        # If a local config doesn't exist, create it
-        if not Path(self.LOCAL_CONFIG).exists():
-            shutil.copyfile(self.BASE_CONFIG, self.LOCAL_CONFIG)
-
-        # Open local config file and change only the changed position
-        with codecs.open(self.LOCAL_CONFIG, encoding="utf-8") as file:
-            lines = file.readlines()
-
-        # TODO: If an older version is used and CURRENT_POSITION doesn't exist,
-        # it should add it
-        with codecs.open(self.LOCAL_CONFIG, "w", encoding="utf-8") as file:
-            for line in lines:
-                if "CURRENT_POSITION" in line:
-                    file.write(f"CURRENT_POSITION={value}\n")
-                else:
-                    file.write(line)
-
-
+import codecs
+import dataclasses
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from DesktopAssistant.StateWriter import StateWriter
+
+
+def parse_minutes(value):
+    return int(value) * 60 * 1000
+
+
+def parse_seconds(value):
+    return int(float(value) * 1000)
+
+
+def parse_text(value):
+    return value.replace("\\n", "\n")
+
+
+def parse_slide_animations(value):
+    value = value.upper()
+    if value not in ("FULL", "SHORT", "OFF"):
+        raise ValueError(f"expected FULL, SHORT or OFF, got {value}")
+    return value
+
+
+def parse_scene_renderer(value):
+    value = value.upper()
+    if value not in ("WIDGETS", "COMPOSITED"):
+        raise ValueError(f"expected WIDGETS or COMPOSITED, got {value}")
+    return value
+
+
+def parse_screens(value):
+    """
+    :return: "PRIMARY", "ALL", or a tuple of screen numbers starting from 1
+    """
+    value = value.upper()
+    if value in ("PRIMARY", "ALL"):
+        return value
+
+    screens = tuple(int(screen) for screen in value.split(",") if screen.strip())
+    if not screens or min(screens) < 1:
+        raise ValueError(f"expected PRIMARY, ALL or screen numbers like 1,2, got {value}")
+    return screens
+
+
+def parse_megabytes(value):
+    return parse_non_negative(value) * 1024 * 1024
+
+
+def parse_on_off(value):
+    value = value.upper()
+    if value not in ("ON", "OFF"):
+        raise ValueError(f"expected ON or OFF, got {value}")
+    return value == "ON"
+
+
+def parse_non_negative(value):
+    value = int(value)
+    if value < 0:
+        raise ValueError(f"expected 0 or more, got {value}")
+    return value
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    Fully parsed config values. Lengths and intervals are already converted to milliseconds.
+    """
+    work_length: int
+    break_length: int
+    stand_frequency: int
+    stand_length: int
+    max_animation_fps: int
+    progress_update_interval: int
+    slide_animations: str
+    blink_min: int
+    blink_max: int
+    scene_renderer: str
+    break_prompt_text: str
+    work_start_text: str
+    stand_up_text: str
+    theme_pack: str
+    art_memory_budget: int
+    diagnostics: bool
+    screens: object
+    position_one_offset_x: int
+    position_one_offset_y: int
+    position_two_offset_x: int
+    position_two_offset_y: int
+    saved_position: int
+    work_count: int
+    last_cycle_date: str
+
+
+# Config file key -> (Config field, parser). Every key here has to be in base-config.txt
+CONFIG_SCHEMA = {
+    "WORK_LENGTH": ("work_length", parse_minutes),
+    "BREAK_LENGTH": ("break_length", parse_minutes),
+    "STAND_FREQUENCY": ("stand_frequency", parse_non_negative),
+    "STAND_TIME": ("stand_length", parse_minutes),
+    "MAX_ANIMATION_FPS": ("max_animation_fps", parse_non_negative),
+    "PROGRESS_UPDATE_INTERVAL": ("progress_update_interval", parse_seconds),
+    "SLIDE_ANIMATIONS": ("slide_animations", parse_slide_animations),
+    "BLINK_MIN_SECONDS": ("blink_min", parse_seconds),
+    "BLINK_MAX_SECONDS": ("blink_max", parse_seconds),
+    "SCENE_RENDERER": ("scene_renderer", parse_scene_renderer),
+    "BREAK_PROMPT_TEXT": ("break_prompt_text", parse_text),
+    "WORK_START_TEXT": ("work_start_text", parse_text),
+    "STAND_UP_TEXT": ("stand_up_text", parse_text),
+    "THEME_PACK": ("theme_pack", str),
+    "ART_MEMORY_BUDGET": ("art_memory_budget", parse_megabytes),
+    "DIAGNOSTICS": ("diagnostics", parse_on_off),
+    "SCREENS": ("screens", parse_screens),
+    "POSITION_ONE_OFFSET_X": ("position_one_offset_x", int),
+    "POSITION_ONE_OFFSET_Y": ("position_one_offset_y", int),
+    "POSITION_TWO_OFFSET_X": ("position_two_offset_x", int),
+    "POSITION_TWO_OFFSET_Y": ("position_two_offset_y", int),
+    "CURRENT_POSITION": ("saved_position", int),
+    "WORK_COUNT": ("work_count", parse_non_negative),
+    "LAST_CYCLE_DATE": ("last_cycle_date", str),
+}
+
+
+class ConfigReader(QObject):
+    """
+    Simple class for loading saved parameters from a text file. Uses "base-config.txt" for default values,
+    then loads any user values from "local-config.txt"
+
+    Everything is parsed once into a frozen Config, so the getters are just lookups. Call watch() once the
+    app is running to pick up edits to either file, the changed signal fires with the new Config.
+    """
+    BASE_CONFIG = "base-config.txt"
+    LOCAL_CONFIG = "local-config.txt"
+
+    # Editors tend to write files in a few steps, so wait for them to settle before re-parsing
+    RELOAD_DELAY = 200
+
+    changed = pyqtSignal(object)
+
+    def __init__(self, *args, save_state=True, **kwargs):
+        """
+        :param save_state: Whether changes like the current position get saved to the local config. Turned
+        off for simulations so they don't touch the real files
+        """
+        super(ConfigReader, self).__init__(*args, **kwargs)
+
+        self.watcher = None
+        self.reload_timer = None
+        self.state_writer = None
+        if save_state:
+            self.state_writer = StateWriter(self.LOCAL_CONFIG, self.BASE_CONFIG)
+        self.files_hash = self.get_files_hash()
+        self.config = self.load_config()
+
+    def parse_config_file(self, filename):
+        """
+        Reads the raw PROPERTY=VALUE pairs out of a config file
+        :param filename: Config file to read
+        :return: Dictionary of property to unparsed value
+        """
+        values = {}
+        if not Path(filename).exists():
+            return values
+
+        with codecs.open(filename, encoding="utf-8") as file:
+            for line in file.readlines():
+
+                # If the line is blank or is a comment, ignore
+                if not line.strip() or line.startswith("#"):
+                    continue
+
+                # Split off anything after any # values
+                line = line.split("#")[0]
+
+                if "=" not in line:
+                    print("Error parsing config: line is not parsable:")
+                    print(line)
+                    continue
+
+                key, value = line.split("=", 1)
+                values[key.strip()] = value.strip()
+
+        return values
+
+    def load_config(self):
+        """
+        Parses and validates both config files. Local values that don't parse fall back to the base ones
+        :return: The parsed Config
+        """
+        base_values = self.parse_config_file(self.BASE_CONFIG)
+        local_values = self.parse_config_file(self.LOCAL_CONFIG)
+
+        # Anything still waiting to be saved is newer than what's on disk
+        if self.state_writer:
+            local_values.update(self.state_writer.get_pending())
+
+        fields = {}
+        for key, (field, parser) in CONFIG_SCHEMA.items():
+            if key in local_values:
+                try:
+                    fields[field] = parser(local_values[key])
+                    continue
+                except ValueError as error:
+                    print(f"Error parsing config: {key} in {self.LOCAL_CONFIG} is invalid, using the default:")
+                    print(error)
+
+            fields[field] = parser(base_values[key])
+
+        return Config(**fields)
+
+    def get_files_hash(self):
+        """
+        :return: Hash of both config files, used to skip reloads when nothing actually changed
+        """
+        digest = hashlib.sha1()
+        for filename in (self.BASE_CONFIG, self.LOCAL_CONFIG):
+            if Path(filename).exists():
+                digest.update(Path(filename).read_bytes())
+            digest.update(b"\0")
+        return digest.digest()
+
+    def watch(self):
+        """
+        Starts watching both config files for changes
+        """
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(self.RELOAD_DELAY)
+        self.reload_timer.timeout.connect(self.reload)
+
+        # The directory is watched too so a local config that gets created or swapped in is noticed
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.reload_timer.start)
+        self.watcher.directoryChanged.connect(self.reload_timer.start)
+        self.watcher.addPath(str(Path(self.BASE_CONFIG).absolute().parent))
+        self.watch_files()
+
+    def watch_files(self):
+        # Files that are replaced rather than written in place drop out of the watcher, so add them back
+        for filename in (self.BASE_CONFIG, self.LOCAL_CONFIG):
+            path = str(Path(filename).absolute())
+            if Path(path).exists() and path not in self.watcher.files():
+                self.watcher.addPath(path)
+
+    def reload(self):
+        """
+        Re-parses the config if either file changed, then lets everyone know about the new values
+        """
+        self.watch_files()
+
+        files_hash = self.get_files_hash()
+        if files_hash == self.files_hash:
+            return
+        self.files_hash = files_hash
+
+        try:
+            config = self.load_config()
+        except (KeyError, ValueError) as error:
+            print(f"Error reloading config, keeping the current values: {error}")
+            return
+
+        if config != self.config:
+            self.config = config
+            self.changed.emit(config)
+
+    def get_break_length(self):
+        return self.config.break_length
+
+    def get_work_length(self):
+        return self.config.work_length
+
+    def get_stand_frequency(self):
+        return self.config.stand_frequency
+
+    def get_stand_length(self):
+        return self.config.stand_length
+
+    def get_max_animation_fps(self):
+        return self.config.max_animation_fps
+
+    def get_progress_update_interval(self):
+        return self.config.progress_update_interval
+
+    def get_slide_animations(self):
+        return self.config.slide_animations
+
+    def get_blink_min(self):
+        return self.config.blink_min
+
+    def get_blink_max(self):
+        return self.config.blink_max
+
+    def get_scene_renderer(self):
+        return self.config.scene_renderer
+
+    def get_break_prompt_text(self):
+        return self.config.break_prompt_text
+
+    def get_work_start_text(self):
+        return self.config.work_start_text
+
+    def get_stand_up_text(self):
+        return self.config.stand_up_text
+
+    def get_theme_pack(self):
+        return self.config.theme_pack
+
+    def get_art_memory_budget(self):
+        return self.config.art_memory_budget
+
+    def get_screens(self):
+        return self.config.screens
+
+    def get_diagnostics(self):
+        return self.config.diagnostics
+
+    def get_position_one_offsets(self):
+        return self.config.position_one_offset_x, self.config.position_one_offset_y
+
+    def get_position_two_offsets(self):
+        return self.config.position_two_offset_x, self.config.position_two_offset_y
+
+    def get_saved_position(self):
+        return self.config.saved_position
+
+    def get_work_count(self):
+        return self.config.work_count
+
+    def get_last_cycle_date(self):
+        return self.config.last_cycle_date
+
+    def set_state(self, **values):
+        """
+        Updates config values the app keeps track of itself, then saves them to the local config in the
+        background
+        :param values: Config field names and their new values
+        """
+        self.config = dataclasses.replace(self.config, **values)
+        if not self.state_writer:
+            return
+
+        fields_to_keys = {field: key for key, (field, parser) in CONFIG_SCHEMA.items()}
+        for field, value in values.items():
+            self.state_writer.set(fields_to_keys[field], value)
+
+    def set_current_position(self, value):
+        if value != self.config.saved_position:
+            self.set_state(saved_position=value)
+
+    def set_theme_pack(self, name):
+        if name != self.config.theme_pack:
+            self.set_state(theme_pack=name)
+
+    def set_work_count(self, work_count, cycle_date):
+        self.set_state(work_count=work_count, last_cycle_date=cycle_date)
@@ -0,0 +1,61 @@
+"""
+Queries or drives the running break reminder from the command line, without starting a second copy. Needs
+the app to already be running, nothing here creates any widgets.
+
+Usage: python -m DesktopAssistant.Control status
+       python -m DesktopAssistant.Control break-now
+       python -m DesktopAssistant.Control snooze
+       python -m DesktopAssistant.Control reload-config
+"""
+import argparse
+import sys
+
+from DesktopAssistant.ControlServer import send_command
+
+COMMANDS = {
+    "status": "Show what the reminder is doing and how long until the next scene",
+    "break-now": "Take a break early, the same as the tray menu option",
+    "snooze": "Snooze the prompt that's showing",
+    "reload-config": "Re-read the config files now instead of waiting for them to be noticed",
+}
+
+
+def format_status(reply):
+    """
+    :param reply: Reply to the status command
+    :return: Text describing it
+    """
+    lines = [f"State: {reply.get('state', '')}"]
+
+    remaining_time = reply.get("remaining_ms", -1)
+    if remaining_time >= 0:
+        minutes = int((remaining_time / 1000) // 60)
+        seconds = int(remaining_time / 1000) % 60
+        lines.append(f"Remaining Time: {minutes}:{seconds:02}")
+
+    lines.append(f"Work sprints today: {reply.get('work_count', 0)}")
+    lines.append(f"Theme: {reply.get('theme', '')}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controls the running break reminder")
+    parser.add_argument("command", choices=COMMANDS,
+                        help="; ".join(f"{name}: {text}" for name, text in COMMANDS.items()))
+    args = parser.parse_args()
+
+    reply = send_command(args.command)
+    if reply is None:
+        print("The break reminder isn't running")
+        return 1
+
+    if not reply.get("ok"):
+        print(reply.get("message", "Something went wrong"))
+        return 1
+
+    print(format_status(reply) if args.command == "status" else reply.get("message", ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import getpass
+import json
+import os
+
+from PyQt6.QtCore import QDir, QLockFile, QObject
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+# One instance per user, so people sharing a machine each get their own
+SERVER_NAME = f"LinearDesktopAssistant-{getpass.getuser()}"
+
+# How long a client waits on the running instance before giving up, in milliseconds
+TIMEOUT = 1_000
+
+
+def send_command(command, args=(), timeout=TIMEOUT):
+    """
+    Sends a command to the running instance and waits for its reply. Only uses QtNetwork, so it works
+    without a QApplication or any widgets
+    :param command: Command name, such as "status"
+    :param args: List of string arguments for the command
+    :param timeout: Milliseconds to wait for each step before giving up
+    :return: The reply dictionary, or None if nothing is running
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(SERVER_NAME)
+    if not socket.waitForConnected(timeout):
+        return None
+
+    socket.write((json.dumps({"command": command, "args": list(args)}) + "\n").encode("utf-8"))
+    socket.waitForBytesWritten(timeout)
+
+    while not socket.canReadLine():
+        if not socket.waitForReadyRead(timeout):
+            socket.abort()
+            return {"ok": False, "message": "The running instance didn't answer"}
+
+    reply = json.loads(bytes(socket.readLine()).decode("utf-8"))
+    socket.disconnectFromServer()
+    return reply
+
+
+class ControlServer(QObject):
+    """
+    Local socket the running app listens on, so a second launch or the Control CLI can talk to it instead of
+    starting a second copy. Each connection sends one JSON line, {"command": ..., "args": [...]}, and gets one
+    JSON line back with at least "ok" and "message".
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ControlServer, self).__init__(*args, **kwargs)
+
+        # Command name -> function taking the argument list and returning a reply dictionary
+        self.handlers = {}
+
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+
+        # With access options set, QLocalServer makes the socket under a temporary name and renames it into
+        # place, which quietly replaces one that's in use. So the lock file is what decides which copy runs.
+        # It's held for as long as this lives, and a lock left by a copy that crashed is noticed by its PID
+        self.lock_file = QLockFile(os.path.join(QDir.tempPath(), f"{SERVER_NAME}.lock"))
+        self.lock_file.setStaleLockTime(0)
+
+    def add_command(self, name, handler):
+        """
+        :param name: Command name clients send
+        :param handler: Called with the list of arguments, returns a dictionary to merge into the reply
+        """
+        self.handlers[name] = handler
+
+    def claim(self):
+        """
+        Claims the single instance without starting the server yet. Only needs QtCore and QtNetwork, so it can
+        be done before a QApplication or any widgets exist, see Launcher
+        :return: Whether this is the only instance, False if another one already is
+        """
+        if self.lock_file.isLocked():
+            return True
+        if not self.lock_file.tryLock(0):
+            return False
+
+        # A crash can leave the socket file behind. It's only safe to replace if nothing answers on it, a
+        # running instance that's still starting up accepts the connection even before it replies
+        if send_command("status") is not None:
+            self.lock_file.unlock()
+            return False
+        return True
+
+    def listen(self):
+        """
+        Claims the name if that hasn't been done yet, then starts taking commands
+        :return: Whether the server is listening, False if another instance already is
+        """
+        if not self.claim():
+            return False
+
+        QLocalServer.removeServer(SERVER_NAME)
+        if self.server.listen(SERVER_NAME):
+            return True
+
+        print(f"Error starting the control server: {self.server.errorString()}")
+        self.lock_file.unlock()
+        return False
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def on_ready_read(self, socket):
+        if not socket.canReadLine():
+            return
+
+        reply = self.handle(bytes(socket.readLine()).decode("utf-8", errors="replace"))
+        socket.write((json.dumps(reply) + "\n").encode("utf-8"))
+        socket.flush()
+        socket.disconnectFromServer()
+
+    def handle(self, line):
+        """
+        :param line: One request line from a client
+        :return: Reply dictionary
+        """
+        try:
+            request = json.loads(line)
+            command = request["command"]
+            args = [str(arg) for arg in request.get("args", [])]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return {"ok": False, "message": "Couldn't read the command"}
+
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {"ok": False, "message": f"Unknown command {command}, try one of {', '.join(self.handlers)}"}
+        return {"ok": True, "message": "", **handler(args)}
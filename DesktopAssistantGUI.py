@@ -1,186 +1,466 @@
-import os
-import shutil
-from pathlib import Path
-from sys import argv
-from sys import exit
-
-from PyQt6.QtGui import QAction, QIcon
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QApplication, QWidget, QSystemTrayIcon, QMenu
-
-from DesktopAssistant.BreakReminderWidget import BreakReminderWidget
-from DesktopAssistant.ConfigReader import ConfigReader
-
-
-class DesktopAssistantGUI:
-    WIDTH = 600
-    HEIGHT = 600
-    TASKBAR_HEIGHT = 40
-
-    def __init__(self):
-
-        self.config = ConfigReader()
-        self.app = QApplication(argv)
-
-        # Create a transparent main window that's always on top
-        # QtCore.Qt.Tool removes the icon from the taskbar
-        self.window = QWidget()
-        self.window.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
-        self.window.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint
-                                   | Qt.WindowType.Tool)
-
-        # Create the widget itself
-        self.reminder = BreakReminderWidget(self.WIDTH, self.HEIGHT, self.config, parent=self.window)
-
-        self.reminder.show_scene()
-
-        # Create a system tray icon
-        self.system_tray = QSystemTrayIcon()
-        icon = QIcon(os.path.join("Images", "wrinkle.png"))
-        self.system_tray.setIcon(icon)
-        self.system_tray.setVisible(True)
-
-        # Create various system tray menu options
-        self.system_tray_menu = QMenu()
-
-        exit_action = QAction("Exit")
-        exit_action.triggered.connect(exit)
-
-        open_config_action = QAction("Edit Config")
-        open_config_action.triggered.connect(self.open_config_file)
-
-        end_work_action = QAction("Take Break Early")
-        end_work_action.triggered.connect(self.reminder.show_break_dialog)
-
-        self.remaining_time_action = QAction(f"Remaining Time: Loading...")
-        self.system_tray_menu.aboutToShow.connect(self.update_timer_display)
-
-        self.system_tray_menu.addAction(self.remaining_time_action)
-        self.system_tray_menu.addSeparator()
-
-        self.system_tray_menu.addAction(end_work_action)
-        self.system_tray_menu.addAction(open_config_action)
-        self.system_tray_menu.addSeparator()
-
-        position_menu = self.system_tray_menu.addMenu("Window Position")
-        saved_position = self.config.get_saved_position()
-        self.default_position_action = QAction("Default Position")
-        self.default_position_action.setCheckable(True)
-        self.default_position_action.triggered.connect(self.change_position_default)
-
-        if saved_position == 0:
-            self.default_position_action.setChecked(True)
-
-        self.position_one_action = QAction("Position One")
-        self.position_one_action.setCheckable(True)
-        self.position_one_action.triggered.connect(self.change_position_one)
-
-        if saved_position == 1:
-            self.position_one_action.setChecked(True)
-
-        self.position_two_action = QAction("Position Two")
-        self.position_two_action.setCheckable(True)
-        self.position_two_action.triggered.connect(self.change_position_two)
-
-        if saved_position == 2:
-            self.position_two_action.setChecked(True)
-
-        position_menu.addAction(self.default_position_action)
-        position_menu.addAction(self.position_one_action)
-        position_menu.addAction(self.position_two_action)
-
-        self.system_tray_menu.addSeparator()
-        self.system_tray_menu.addAction(exit_action)
-        self.system_tray_menu.addSeparator()
-        self.system_tray.setContextMenu(self.system_tray_menu)
-
-        # Determine bottom right corner of screen, then place the window
-        # Reads any saved offsets from the config file and loads the last used
-        self.set_position_from_config()
-
-        self.window.show()
-        self.app.exec()
-
-    def update_timer_display(self):
-        """
-        Updates the timer that appears in the system tray for remaining work time
-        :return:
-        """
-        remaining_time = self.reminder.active_timer.remainingTime()
-
-        # If no timer is running, just report that
-        if remaining_time < 0:
-            self.remaining_time_action.setText(f"Remaining Time: None")
-            return
-
-        # Otherwise format it nicely
-        minutes = int((remaining_time / 1000) // 60)
-        seconds = int(remaining_time / 1000) % 60
-
-        self.remaining_time_action.setText(f"Remaining Time: {minutes}:{seconds:02}")
-
-    def open_config_file(self):
-        """
-        Opens the local config file in a text editor to edit
-        :return:
-        """
-
-        # If a local config doesn't exist, create it
-        if not Path("local-config.txt").exists():
-            shutil.copyfile("base-config.txt", "local-config.txt")
-
-        os.startfile("local-config.txt")
-
-    def set_position_from_config(self):
-        """
-        Reads the last used position from the local config file and uses it
-        :return:
-        """
-        if self.config.get_saved_position() == 1:
-            self.change_position_one()
-        elif self.config.get_saved_position() == 2:
-            self.change_position_two()
-        else:
-            self.change_position_default()
-
-    def change_position_default(self):
-        self.config.set_current_position(0)
-        self.change_position((0, 0))
-        self.default_position_action.setChecked(True)
-        self.position_one_action.setChecked(False)
-        self.position_two_action.setChecked(False)
-
-    def change_position_one(self):
-        self.config.set_current_position(1)
-        self.change_position(self.config.get_position_one_offsets())
-        self.default_position_action.setChecked(False)
-        self.position_one_action.setChecked(True)
-        self.position_two_action.setChecked(False)
-
-    def change_position_two(self):
-        self.config.set_current_position(2)
-        self.change_position(self.config.get_position_two_offsets())
-        self.default_position_action.setChecked(False)
-        self.position_one_action.setChecked(False)
-        self.position_two_action.setChecked(True)
-
-    def change_position(self, offsets):
-        """
-        Positions the widget using the primary screen's bottom left as a starting point,
-        then uses the defined offsets to reposition
-
-        Changing the monitor was too hard, sorry :P
-        :param offsets:
-        :return:
-        """
-        offset_x = offsets[0]
-        offset_y = offsets[1]
-
-        screen_geometry = self.app.primaryScreen().availableGeometry()
-        x = screen_geometry.width() - self.WIDTH + offset_x
-        y = screen_geometry.height() - self.HEIGHT - self.TASKBAR_HEIGHT + offset_y
-        self.window.setGeometry(x, y, self.WIDTH, self.HEIGHT)
-
-
-# Start!
-DesktopAssistantGUI()
+import os
+import shutil
+from pathlib import Path
+from sys import argv
+from sys import exit
+
+from PyQt6.QtGui import QAction, QActionGroup, QIcon
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication, QWidget, QSystemTrayIcon, QMenu
+
+from DesktopAssistant.AssetLoader import get_asset_loader
+from DesktopAssistant.AssetWatcher import AssetWatcher
+from DesktopAssistant.BreakReminderWidget import BreakReminderWidget
+from DesktopAssistant.ConfigReader import ConfigReader
+from DesktopAssistant.Diagnostics import diagnostics, format_sample
+from DesktopAssistant.SessionHistory import SessionHistory
+from DesktopAssistant.SpriteAtlas import get_sprite_key
+from DesktopAssistant.ThemePack import ThemePack, find_pack, find_packs
+
+
+class DesktopAssistantGUI:
+    WIDTH = 600
+    HEIGHT = 600
+    TASKBAR_HEIGHT = 40
+
+    # How many weeks of history the stats menu shows
+    STATS_WEEKS = 12
+
+    def __init__(self, app, control_server):
+        """
+        :param app: The QApplication
+        :param control_server: ControlServer that's already listening, see Launcher
+        """
+        self.app = app
+        self.control_server = control_server
+        self.config = ConfigReader()
+
+        # Pick up any edits to the config files without needing a restart
+        self.config.watch()
+        self.config.changed.connect(self.apply_config)
+
+        self.window = self.create_window()
+
+        # Load art with as many pixels as the screen has, so nothing gets scaled while painting
+        get_asset_loader().set_device_pixel_ratio(self.app.primaryScreen().devicePixelRatio())
+
+        # Diagnostics have to be on before the widgets are made so they can hook into them
+        diagnostics.set_enabled(self.config.get_diagnostics())
+
+        # Only the theme pack manifests are read here, a pack's art isn't loaded until it's picked
+        self.packs = find_packs()
+        pack = find_pack(self.config.get_theme_pack(), self.packs)
+
+        # Create the widget itself, logging everything it does
+        self.reminder = BreakReminderWidget(self.WIDTH, self.HEIGHT, self.config, parent=self.window, pack=pack)
+        self.history = SessionHistory()
+        self.reminder.state_changed.connect(self.history.record_state)
+
+        self.reminder.show_scene()
+
+        # Art that's edited while the app is running is swapped in without a restart
+        self.asset_watcher = AssetWatcher([ThemePack.DEFAULT_DIRECTORY, ThemePack.PACKS_DIRECTORY])
+        self.asset_watcher.changed.connect(self.on_assets_changed)
+
+        # Copies of the assistant on other screens, screen -> (window, BreakReminderWidget). They all share
+        # the main one's session and art, see update_screens
+        self.leader_screen = self.app.primaryScreen()
+        self.mirror_windows = {}
+
+        # Create a system tray icon
+        self.system_tray = QSystemTrayIcon()
+        self.system_tray.setIcon(QIcon(str(pack.icon_path)))
+        self.system_tray.setVisible(True)
+
+        # Create various system tray menu options
+        self.system_tray_menu = QMenu()
+
+        exit_action = QAction("Exit")
+        exit_action.triggered.connect(exit)
+
+        open_config_action = QAction("Edit Config")
+        open_config_action.triggered.connect(self.open_config_file)
+
+        end_work_action = QAction("Take Break Early")
+        end_work_action.triggered.connect(self.reminder.show_break_dialog)
+
+        self.remaining_time_action = QAction(f"Remaining Time: Loading...")
+        self.system_tray_menu.aboutToShow.connect(self.update_timer_display)
+
+        self.system_tray_menu.addAction(self.remaining_time_action)
+        self.system_tray_menu.addSeparator()
+
+        self.system_tray_menu.addAction(end_work_action)
+        self.system_tray_menu.addAction(open_config_action)
+        self.system_tray_menu.addSeparator()
+
+        position_menu = self.system_tray_menu.addMenu("Window Position")
+        saved_position = self.config.get_saved_position()
+        self.default_position_action = QAction("Default Position")
+        self.default_position_action.setCheckable(True)
+        self.default_position_action.triggered.connect(self.change_position_default)
+
+        if saved_position == 0:
+            self.default_position_action.setChecked(True)
+
+        self.position_one_action = QAction("Position One")
+        self.position_one_action.setCheckable(True)
+        self.position_one_action.triggered.connect(self.change_position_one)
+
+        if saved_position == 1:
+            self.position_one_action.setChecked(True)
+
+        self.position_two_action = QAction("Position Two")
+        self.position_two_action.setCheckable(True)
+        self.position_two_action.triggered.connect(self.change_position_two)
+
+        if saved_position == 2:
+            self.position_two_action.setChecked(True)
+
+        position_menu.addAction(self.default_position_action)
+        position_menu.addAction(self.position_one_action)
+        position_menu.addAction(self.position_two_action)
+
+        # Packs are switched between right away, no restart needed
+        self.theme_menu = self.system_tray_menu.addMenu("Theme")
+        self.theme_actions = QActionGroup(self.theme_menu)
+        self.update_theme_menu()
+
+        self.stats_menu = self.system_tray_menu.addMenu("Stats")
+        self.stats_menu.aboutToShow.connect(self.update_stats_display)
+
+        self.diagnostics_menu = self.system_tray_menu.addMenu("Diagnostics")
+        self.diagnostics_menu.aboutToShow.connect(self.update_diagnostics_display)
+
+        self.system_tray_menu.addSeparator()
+        self.system_tray_menu.addAction(exit_action)
+        self.system_tray_menu.addSeparator()
+        self.system_tray.setContextMenu(self.system_tray_menu)
+
+        # Determine bottom right corner of screen, then place the window
+        # Reads any saved offsets from the config file and loads the last used
+        self.update_screens()
+        self.app.screenAdded.connect(self.update_screens)
+        self.app.screenRemoved.connect(self.update_screens)
+        self.app.primaryScreenChanged.connect(self.update_screens)
+
+        # Take commands from later launches and the Control CLI. Anything sent while this was starting up has
+        # been waiting on the socket, and is handled once the event loop starts
+        self.control_server.add_command("activate", self.on_activate_command)
+        self.control_server.add_command("status", self.on_status_command)
+        self.control_server.add_command("break-now", self.on_break_now_command)
+        self.control_server.add_command("snooze", self.on_snooze_command)
+        self.control_server.add_command("reload-config", self.on_reload_config_command)
+
+        self.window.show()
+        self.app.exec()
+
+    def apply_config(self):
+        """
+        Pushes a reloaded config out to the running widgets
+        :return:
+        """
+        self.reminder.apply_config()
+        self.update_screens()
+        self.apply_pack()
+
+    @staticmethod
+    def create_window():
+        """
+        Creates a transparent window that's always on top
+        :return: The window
+        """
+        # QtCore.Qt.Tool removes the icon from the taskbar
+        window = QWidget()
+        window.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        window.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint
+                              | Qt.WindowType.Tool)
+        return window
+
+    def get_chosen_screens(self):
+        """
+        :return: List of screens the SCREENS setting picks that are connected right now, the primary screen
+        first if it's one of them
+        """
+        screens = self.app.screens()
+        primary_screen = self.app.primaryScreen()
+        setting = self.config.get_screens()
+        if setting == "ALL":
+            chosen = list(screens)
+        elif setting == "PRIMARY":
+            chosen = [primary_screen]
+        else:
+            chosen = [screens[number - 1] for number in setting if number <= len(screens)]
+
+        chosen.sort(key=lambda screen: screen is not primary_screen)
+        return chosen or [primary_screen]
+
+    def update_screens(self, *args):
+        """
+        Puts the main window on the first chosen screen and a mirror on each of the others, adding and
+        removing mirrors as screens come and go. Mirrors share the main window's art, so nothing is reloaded
+        """
+        chosen = self.get_chosen_screens()
+        self.leader_screen = chosen[0]
+
+        for screen in list(self.mirror_windows):
+            if screen not in chosen[1:]:
+                window, mirror = self.mirror_windows.pop(screen)
+                self.reminder.remove_mirror(mirror)
+                window.deleteLater()
+
+        for screen in chosen[1:]:
+            if screen not in self.mirror_windows:
+                window = self.create_window()
+                mirror = BreakReminderWidget(self.WIDTH, self.HEIGHT, self.config, parent=window,
+                                             leader=self.reminder)
+                self.mirror_windows[screen] = (window, mirror)
+                self.place_window(window, screen, (0, 0))
+                window.show()
+
+        self.set_position_from_config()
+
+    def change_pack(self, name):
+        self.config.set_theme_pack(name)
+        self.apply_pack()
+
+    def apply_pack(self):
+        """
+        Switches to the theme pack set in the config, if it isn't already showing
+        """
+        pack = find_pack(self.config.get_theme_pack(), self.packs)
+        self.reminder.set_pack(pack)
+        self.system_tray.setIcon(QIcon(str(pack.icon_path)))
+        for action in self.theme_actions.actions():
+            action.setChecked(action.text() == pack.name)
+
+    def update_theme_menu(self):
+        """
+        Fills the theme menu with every installed pack
+        """
+        for action in self.theme_actions.actions():
+            self.theme_actions.removeAction(action)
+            self.theme_menu.removeAction(action)
+            action.deleteLater()
+
+        for name in self.packs:
+            action = self.theme_menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(name == self.reminder.pack.name)
+            action.triggered.connect(lambda checked, name=name: self.change_pack(name))
+            self.theme_actions.addAction(action)
+
+    def update_packs(self, paths):
+        """
+        Looks for packs again after one was installed, removed or had its manifest changed. Packs whose
+        manifest didn't change keep their ThemePack so the one showing isn't reloaded for nothing
+        :param paths: Absolute Paths that changed
+        """
+        packs = find_packs()
+        for name, pack in packs.items():
+            old_pack = self.packs.get(name)
+            if (old_pack is not None and old_pack.directory == pack.directory
+                    and (old_pack.directory / ThemePack.MANIFEST).absolute() not in paths):
+                packs[name] = old_pack
+        self.packs = packs
+
+        self.update_theme_menu()
+        # The configured pack might have just been installed, or the one showing taken away
+        self.apply_pack()
+
+    def on_assets_changed(self, paths):
+        if any(path.name == ThemePack.MANIFEST for path in paths):
+            self.update_packs(paths)
+
+        self.reminder.reload_images(paths)
+
+        pack = self.reminder.pack
+        if any(get_sprite_key(path) == get_sprite_key(pack.icon_path) for path in paths):
+            self.system_tray.setIcon(QIcon(str(pack.icon_path)))
+
+    def on_activate_command(self, args):
+        # Someone tried to start a second copy, let them know where this one is
+        self.system_tray.showMessage("Linear", "Already running, right click the tray icon for options")
+        return {"message": "Already running"}
+
+    def on_status_command(self, args):
+        return {
+            "state": self.reminder.state,
+            "remaining_ms": self.reminder.get_remaining_time(),
+            "work_count": self.reminder.work_count,
+            "theme": self.reminder.pack.name,
+        }
+
+    def on_break_now_command(self, args):
+        if self.reminder.state in (BreakReminderWidget.STATE_BREAK_PROMPT, BreakReminderWidget.STATE_BREAK):
+            return {"ok": False, "message": "Already on a break"}
+        self.reminder.show_break_dialog()
+        return {"message": "Break time!"}
+
+    def on_snooze_command(self, args):
+        if self.reminder.state != BreakReminderWidget.STATE_BREAK_PROMPT:
+            return {"ok": False, "message": "There's no break prompt to snooze"}
+        self.reminder.begin_snooze()
+        return {"message": "Snoozed"}
+
+    def on_reload_config_command(self, args):
+        self.config.reload()
+        return {"message": "Config reloaded"}
+
+    def update_timer_display(self):
+        """
+        Updates the timer that appears in the system tray for remaining work time
+        :return:
+        """
+        remaining_time = self.reminder.get_remaining_time()
+
+        # If no timer is running, just report that
+        if remaining_time < 0:
+            self.remaining_time_action.setText(f"Remaining Time: None")
+            return
+
+        # Otherwise format it nicely
+        minutes = int((remaining_time / 1000) // 60)
+        seconds = int(remaining_time / 1000) % 60
+
+        self.remaining_time_action.setText(f"Remaining Time: {minutes}:{seconds:02}")
+
+    @staticmethod
+    def format_counts(counts):
+        """
+        Describes one day or week of session history
+        :param counts: Dictionary of BreakReminderWidget state to how many times it happened
+        :return: Text for the stats menu
+        """
+        work = counts.get(BreakReminderWidget.STATE_WORK, 0)
+        breaks = counts.get(BreakReminderWidget.STATE_BREAK, 0)
+        snoozes = counts.get(BreakReminderWidget.STATE_SNOOZE, 0)
+        text = f"{work} work sprints, {breaks} breaks, {snoozes} snoozes"
+
+        prompts = counts.get(BreakReminderWidget.STATE_BREAK_PROMPT, 0)
+        if prompts:
+            text += f", {min(100, breaks * 100 // prompts)}% of breaks taken"
+        return text
+
+    def update_stats_display(self):
+        """
+        Fills the stats menu from the session history rollups
+        :return:
+        """
+        self.stats_menu.clear()
+
+        today = self.history.get_daily_counts(1)
+        self.stats_menu.addAction(f"Today: {self.format_counts(next(iter(today.values()), {}))}").setEnabled(False)
+
+        weeks = self.history.get_weekly_counts(self.STATS_WEEKS)
+        if not weeks:
+            return
+
+        self.stats_menu.addSeparator()
+        for week, counts in sorted(weeks.items(), reverse=True):
+            self.stats_menu.addAction(f"{week}: {self.format_counts(counts)}").setEnabled(False)
+
+    def update_diagnostics_display(self):
+        """
+        Fills the diagnostics menu with the latest measurements
+        :return:
+        """
+        self.diagnostics_menu.clear()
+
+        if not diagnostics.enabled:
+            self.diagnostics_menu.addAction("Set DIAGNOSTICS=ON in the config to collect timings").setEnabled(False)
+            return
+
+        stats = diagnostics.get_stats()
+        if not stats:
+            self.diagnostics_menu.addAction("Nothing measured yet").setEnabled(False)
+
+        for name, values in stats.items():
+            p50, p99 = (format_sample(values[key], values["unit"]) for key in ("p50", "p99"))
+            text = f"{name}: p50 {p50}, p99 {p99} ({values['count']})"
+            self.diagnostics_menu.addAction(text).setEnabled(False)
+
+        self.diagnostics_menu.addSeparator()
+        save_action = self.diagnostics_menu.addAction("Save to diagnostics.json")
+        save_action.triggered.connect(self.save_diagnostics)
+
+    def save_diagnostics(self):
+        diagnostics.dump("diagnostics.json")
+        self.system_tray.showMessage("Diagnostics", f"Saved to {Path('diagnostics.json').absolute()}")
+
+    def open_config_file(self):
+        """
+        Opens the local config file in a text editor to edit
+        :return:
+        """
+
+        # If a local config doesn't exist, create it
+        if not Path("local-config.txt").exists():
+            shutil.copyfile("base-config.txt", "local-config.txt")
+
+        os.startfile("local-config.txt")
+
+    def set_position_from_config(self):
+        """
+        Reads the last used position from the local config file and uses it
+        :return:
+        """
+        if self.config.get_saved_position() == 1:
+            self.change_position_one()
+        elif self.config.get_saved_position() == 2:
+            self.change_position_two()
+        else:
+            self.change_position_default()
+
+    def change_position_default(self):
+        self.config.set_current_position(0)
+        self.change_position((0, 0))
+        self.default_position_action.setChecked(True)
+        self.position_one_action.setChecked(False)
+        self.position_two_action.setChecked(False)
+
+    def change_position_one(self):
+        self.config.set_current_position(1)
+        self.change_position(self.config.get_position_one_offsets())
+        self.default_position_action.setChecked(False)
+        self.position_one_action.setChecked(True)
+        self.position_two_action.setChecked(False)
+
+    def change_position_two(self):
+        self.config.set_current_position(2)
+        self.change_position(self.config.get_position_two_offsets())
+        self.default_position_action.setChecked(False)
+        self.position_one_action.setChecked(False)
+        self.position_two_action.setChecked(True)
+
+    def change_position(self, offsets):
+        """
+        Positions the main widget using its screen's bottom left as a starting point,
+        then uses the defined offsets to reposition. Mirrors on other screens always sit in the corner
+        :param offsets:
+        :return:
+        """
+        self.place_window(self.window, self.leader_screen, offsets)
+
+    def place_window(self, window, screen, offsets):
+        """
+        Moves a window to the bottom right of a screen, plus any offsets
+        :param window: Window to move
+        :param screen: QScreen to put it on
+        :param offsets: (x, y) tuple to move it by from there
+        """
+        offset_x = offsets[0]
+        offset_y = offsets[1]
+
+        screen_geometry = screen.availableGeometry()
+        x = screen_geometry.x() + screen_geometry.width() - self.WIDTH + offset_x
+        y = screen_geometry.y() + screen_geometry.height() - self.HEIGHT - self.TASKBAR_HEIGHT + offset_y
+        window.setGeometry(x, y, self.WIDTH, self.HEIGHT)
+
+
+# Start!
+if __name__ == "__main__":
+    # Launcher does the single instance check before any of the modules above are loaded, this is only here
+    # so starting this file directly still works
+    from DesktopAssistant.Launcher import main
+    exit(main())
@@ -1,4 +1,4 @@
-class DesktopButton:
-    def __init__(self, text, function):
-        self.text = text
-        self.function = function
+class DesktopButton:
+    def __init__(self, text, function):
+        self.text = text
+        self.function = function
@@ -0,0 +1,143 @@
+import json
+import time
+from collections import deque
+
+from PyQt6.QtCore import QObject, QTimer, Qt
+
+
+def format_sample(value, unit):
+    """
+    :return: A sample written out with its unit, timings to 2 decimal places and anything else as a whole number
+    """
+    if unit == "ms":
+        return f"{value:.2f} ms"
+    return f"{value:.0f} {unit}"
+
+
+class RollingHistogram:
+    """
+    Keeps the most recent samples of one measurement in a fixed size ring buffer, so memory use never
+    grows no matter how long the app runs
+    """
+    SIZE = 512
+
+    def __init__(self, unit="ms", size=SIZE):
+        """
+        :param unit: What the samples are measured in, such as "ms" or "px"
+        """
+        self.unit = unit
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+    def get_percentile(self, percentile):
+        """
+        :param percentile: Percentile to find, 0 to 100
+        :return: The value at that percentile of the current samples, or None if there aren't any
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+    def get_stats(self):
+        return {
+            "unit": self.unit,
+            "count": self.count,
+            "p50": self.get_percentile(50),
+            "p99": self.get_percentile(99),
+            "max": max(self.samples, default=None),
+        }
+
+
+class Diagnostics(QObject):
+    """
+    Opt in timing of animation ticks, timer callbacks and pixmap swaps, plus how late timers fire compared
+    to when they were scheduled. Samples are in milliseconds unless they're recorded with another unit, such
+    as the pixels a scene repaint covers. When it's turned off, wrap() hands back the original function so
+    there's no cost at all.
+    """
+    # How often the event loop probe checks how late it's running
+    PROBE_INTERVAL = 250
+
+    def __init__(self, *args, **kwargs):
+        super(Diagnostics, self).__init__(*args, **kwargs)
+
+        self.enabled = False
+        self.histograms = {}
+        self.probe_timer = None
+        self.probe_expected = 0
+
+    def set_enabled(self, enabled):
+        """
+        Turns measuring on or off. Should be set before the widgets are made, since they only wrap their
+        callbacks once
+        """
+        self.enabled = enabled
+        if enabled and self.probe_timer is None:
+            # Checks how far behind the event loop is even when nothing else is going on
+            self.probe_timer = QTimer(self)
+            self.probe_timer.setTimerType(Qt.TimerType.PreciseTimer)
+            self.probe_timer.timeout.connect(self.on_probe)
+            self.probe_expected = time.perf_counter() + self.PROBE_INTERVAL / 1000
+            self.probe_timer.start(self.PROBE_INTERVAL)
+        elif not enabled and self.probe_timer is not None:
+            self.probe_timer.stop()
+            self.probe_timer = None
+
+    def on_probe(self):
+        now = time.perf_counter()
+        self.record("event_loop.lag", max(0.0, (now - self.probe_expected) * 1000))
+        self.probe_expected = now + self.PROBE_INTERVAL / 1000
+
+    def record(self, name, value, unit="ms"):
+        """
+        Adds a sample to a measurement
+        :param name: Measurement name, such as "animation.tick"
+        :param value: Sample, in milliseconds unless it says otherwise
+        :param unit: What the sample is measured in, a measurement should always use the same one
+        """
+        if not self.enabled:
+            return
+        if name not in self.histograms:
+            self.histograms[name] = RollingHistogram(unit)
+        self.histograms[name].add(value)
+
+    def wrap(self, name, function):
+        """
+        Times every call to a function
+        :param name: Measurement name to record the call times under
+        :param function: Function to time
+        :return: The timed function, or the original one if diagnostics are turned off
+        """
+        if not self.enabled:
+            return function
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, (time.perf_counter() - start) * 1000)
+
+        return timed
+
+    def get_stats(self):
+        """
+        :return: Dictionary of measurement name to its unit, count, p50, p99 and max
+        """
+        return {name: histogram.get_stats() for name, histogram in sorted(self.histograms.items())}
+
+    def dump(self, filename):
+        """
+        Saves the current stats as JSON
+        :param filename: File to write to
+        """
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump({"time": time.time(), "stats": self.get_stats()}, file, indent=2)
+
+
+diagnostics = Diagnostics()
@@ -1,77 +1,165 @@
-import os
-from sys import exit
-
-from PIL import Image
-from PIL.ImageQt import ImageQt
-from PyQt6.QtCore import Qt
-
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtWidgets import QLabel, QWidget, QPushButton
-
-
-class DialogueWidget(QWidget):
-    """
-    Base class for showing a dialogue box, including support for dynamic buttons, text,
-    and an exit button
-    """
-
-    active_buttons = []
-
-    def __init__(self, width, height, *args, **kwargs):
-        super(DialogueWidget, self).__init__(*args, **kwargs)
-
-        self.width = width
-        self.height = height
-        self.resize(self.width, self.height)
-
-        # Set up background image
-        image = Image.open(os.path.join("Images", "DialogueBox.png"))
-        image = image.resize((self.width - 200, 150))
-        self.background_label = QLabel(parent=self)
-        self.background_label.setPixmap(QPixmap.fromImage(ImageQt(image)))
-        self.background_label.move(200, 50)
-
-        # Create the text box
-        self.text_label = QLabel(parent=self.background_label)
-        self.text_label.resize(360, 140)
-        self.text_label.move(10, 6)
-        self.text_label.setStyleSheet('font-size: 24px; color: white;')
-        self.text_label.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.text_label.setWordWrap(True)
-
-        # Create the exit button
-        self.exit_button = QPushButton(parent=self.background_label)
-        self.exit_button.resize(32, 32)
-        self.exit_button.move(self.width - 40 - 200, 8)
-        self.exit_button.clicked.connect(exit)
-        self.exit_button.setText("ⓧ")
-        self.exit_button.setStyleSheet('background: transparent; font-size: 24px; color: white')
-
-        # Create all our buttons
-        for index, button in enumerate(range(1, 4)):
-            button_widget = QPushButton(parent=self.background_label)
-            button_widget.move(10 + (index * 130), 110)
-            button_widget.resize(120, 30)
-            button_widget.setStyleSheet('font-size: 18px')
-            button_widget.hide()
-            self.active_buttons.append(button_widget)
-
-    def set_buttons(self, buttons):
-        """
-        Switches the buttons up to a new set to change the layout
-        :param buttons - New buttons to display
-        """
-        # Hide all buttons in case there's less buttons on this next screen
-        for button in self.active_buttons:
-            button.hide()
-
-        # Show the current button, then wire it up to the new function
-        # We must disconnect, otherwise both the new and old function will appear
-        for index, button in enumerate(buttons):
-            self.active_buttons[index].show()
-            self.active_buttons[index].setText(button.text)
-            self.active_buttons[index].disconnect()
-            self.active_buttons[index].clicked.connect(button.function)
-
-    def set_dialogue(self, dialogue):
-        self.text_label.setText(dialogue)
+import os
+from sys import exit
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor, QFont, QPainter, QPalette, QStaticText, QTransform
+from PyQt6.QtWidgets import QLabel, QWidget, QPushButton
+
+from DesktopAssistant.ImageCache import image_cache
+
+
+class DialogueText(QWidget):
+    """
+    Draws one already laid out QStaticText in the widget's font and text colour. Unlike a word wrapped QLabel,
+    changing the text never lays anything out again, it just paints a different layout
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(DialogueText, self).__init__(*args, **kwargs)
+        self.static_text = QStaticText()
+
+    def set_static_text(self, static_text):
+        if static_text is not self.static_text:
+            self.static_text = static_text
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setFont(self.font())
+        painter.setPen(self.palette().color(QPalette.ColorRole.WindowText))
+        painter.drawStaticText(0, 0, self.static_text)
+        painter.end()
+
+
+class DialogueWidget(QWidget):
+    """
+    Base class for showing a dialogue box, including support for dynamic buttons, text,
+    and an exit button
+    """
+
+    # Fonts are set straight on the widgets instead of through style sheets, so Qt never has to work out
+    # styles when the dialogue changes
+    TEXT_FONT_SIZE = 24
+    BUTTON_FONT_SIZE = 18
+    TEXT_COLOR = QColor("white")
+
+    # More distinct prompts than this and the layouts are all thrown out, so reloading the config over and
+    # over can't pile them up
+    MAX_CACHED_TEXTS = 16
+
+    DEFAULT_BACKGROUND = os.path.join("Images", "DialogueBox.png")
+
+    def __init__(self, width, height, *args, background_path=DEFAULT_BACKGROUND, **kwargs):
+        """
+        :param background_path: Image file for the dialogue box, usually the theme pack's
+        """
+        super(DialogueWidget, self).__init__(*args, **kwargs)
+
+        self.width = width
+        self.height = height
+        self.resize(self.width, self.height)
+
+        # Set up background image, shared with any other dialogue boxes through the image cache
+        self.background_label = QLabel(parent=self)
+        self.background_label.resize(self.width - 200, 150)
+        self.background_label.move(200, 50)
+        self.set_background(background_path)
+
+        text_font = self.get_font(self.TEXT_FONT_SIZE)
+        text_palette = QPalette(self.palette())
+        text_palette.setColor(QPalette.ColorRole.WindowText, self.TEXT_COLOR)
+        text_palette.setColor(QPalette.ColorRole.ButtonText, self.TEXT_COLOR)
+
+        # Create the text box. Each prompt is laid out once and kept, see get_static_text
+        self.static_texts = {}
+        self.text_label = DialogueText(parent=self.background_label)
+        self.text_label.resize(360, 140)
+        self.text_label.move(10, 6)
+        self.text_label.setFont(text_font)
+        self.text_label.setPalette(text_palette)
+
+        # Create the exit button
+        self.exit_button = QPushButton(parent=self.background_label)
+        self.exit_button.resize(32, 32)
+        self.exit_button.move(self.width - 40 - 200, 8)
+        self.exit_button.clicked.connect(exit)
+        self.exit_button.setText("ⓧ")
+        self.exit_button.setFlat(True)
+        self.exit_button.setFont(text_font)
+        exit_palette = QPalette(text_palette)
+        exit_palette.setColor(QPalette.ColorRole.Button, QColor(Qt.GlobalColor.transparent))
+        self.exit_button.setPalette(exit_palette)
+
+        # Create all our buttons
+        self.active_buttons = []
+        self.current_buttons = []
+        button_font = self.get_font(self.BUTTON_FONT_SIZE)
+        for index, button in enumerate(range(1, 4)):
+            button_widget = QPushButton(parent=self.background_label)
+            button_widget.move(10 + (index * 130), 110)
+            button_widget.resize(120, 30)
+            button_widget.setFont(button_font)
+            button_widget.hide()
+            self.active_buttons.append(button_widget)
+
+    def get_font(self, pixel_size):
+        font = QFont(self.font())
+        font.setPixelSize(pixel_size)
+        return font
+
+    def set_buttons(self, buttons):
+        """
+        Switches the buttons up to a new set to change the layout
+        :param buttons - New buttons to display
+        """
+        self.current_buttons = buttons
+
+        # Hide all buttons in case there's less buttons on this next screen
+        for button in self.active_buttons:
+            button.hide()
+
+        # Show the current button, then wire it up to the new function
+        # We must disconnect, otherwise both the new and old function will appear
+        for index, button in enumerate(buttons):
+            self.active_buttons[index].show()
+            self.active_buttons[index].setText(button.text)
+            try:
+                self.active_buttons[index].clicked.disconnect()
+            except TypeError:
+                # The first time around there's nothing connected yet
+                pass
+            self.active_buttons[index].clicked.connect(button.function)
+
+    def set_background(self, background_path):
+        """
+        Switches the dialogue box art, keeping the current one up until the new one has loaded
+        :param background_path: Image file for the dialogue box
+        """
+        self.background_path = background_path
+
+        def on_loaded(pixmap):
+            # Only show the most recently asked for background if they finish out of order
+            if background_path == self.background_path:
+                self.background_label.setPixmap(pixmap)
+
+        image_cache.request(background_path, (self.width - 200, 150), on_loaded)
+
+    def get_static_text(self, dialogue):
+        """
+        :param dialogue: Text of a prompt, plain or rich text like a QLabel takes
+        :return: The prompt word wrapped to the text box and laid out in its font, made the first time it's
+        asked for
+        """
+        static_text = self.static_texts.get(dialogue)
+        if static_text is None:
+            if len(self.static_texts) >= self.MAX_CACHED_TEXTS:
+                self.static_texts.clear()
+
+            static_text = QStaticText(dialogue)
+            static_text.setTextWidth(self.text_label.width())
+            static_text.prepare(QTransform(), self.text_label.font())
+            self.static_texts[dialogue] = static_text
+        return static_text
+
+    def set_dialogue(self, dialogue):
+        self.text_label.set_static_text(self.get_static_text(dialogue))
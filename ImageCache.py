@@ -0,0 +1,138 @@
+from collections import OrderedDict
+
+from PyQt6.QtGui import QPixmap
+
+from DesktopAssistant.AssetLoader import AssetLoader, get_asset_loader
+
+
+class ImageCache:
+    """
+    Process wide cache of decoded pixmaps, shared by every widget that shows art. Bounded by the number
+    of bytes the pixmaps take up, evicting the least recently used ones first. Keeps hit and miss counts
+    so it's easy to check what is still going to disk.
+    """
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+
+        # (path, size, device pixel ratio) -> QPixmap, oldest first
+        self.pixmaps = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(path, size):
+        return str(path), tuple(size), get_asset_loader().device_pixel_ratio
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def get(self, path, size):
+        """
+        Looks up a pixmap without loading it
+        :param path: Path of the image file
+        :param size: (width, height) tuple of the loaded image
+        :return: The cached QPixmap, or None if it isn't loaded
+        """
+        key = self.make_key(path, size)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def request(self, path, size, callback, priority=AssetLoader.PRIORITY_HIGH):
+        """
+        Hands a pixmap to the callback, straight away if it's cached, otherwise once the asset loader
+        has decoded it
+        :param path: Path of the image file
+        :param size: (width, height) tuple to resize to
+        :param callback: Called with the QPixmap, or not at all if the image can't be loaded
+        :param priority: Asset loader priority if the image needs decoding
+        """
+        pixmap = self.get(path, size)
+        if pixmap is not None:
+            callback(pixmap)
+            return
+
+        def on_decoded(image):
+            # A failed decode isn't cached, so whatever is showing stays up and the next request tries again
+            if image.isNull():
+                return
+
+            # Another request may have beaten this one to the cache
+            key = self.make_key(path, size)
+            cached = self.pixmaps.get(key)
+            if cached is None:
+                cached = QPixmap.fromImage(image)
+                self.insert(key, cached)
+            callback(cached)
+
+        get_asset_loader().request(path, size, on_decoded, priority)
+
+    def preload(self, requests, priority=AssetLoader.PRIORITY_LOW):
+        """
+        Warms up the cache so later requests for these images don't have to wait
+        :param requests: List of (path, size) tuples
+        :param priority: Asset loader priority for anything that isn't cached yet
+        """
+        for path, size in requests:
+            if self.make_key(path, size) not in self.pixmaps:
+                self.request(path, size, lambda pixmap: None, priority)
+
+    def insert(self, key, pixmap):
+        self.pixmaps[key] = pixmap
+        self.current_bytes += self.pixmap_bytes(pixmap)
+        self.evict_to_budget()
+
+    def evict_to_budget(self):
+        # Always keep the newest entry, even if it's bigger than the whole budget
+        while self.current_bytes > self.max_bytes and len(self.pixmaps) > 1:
+            old_key, old_pixmap = self.pixmaps.popitem(last=False)
+            self.current_bytes -= self.pixmap_bytes(old_pixmap)
+            self.evictions += 1
+
+    def set_max_bytes(self, max_bytes):
+        """
+        Changes the memory budget, evicting the least recently used pixmaps if it shrank
+        :param max_bytes: New budget in bytes
+        """
+        self.max_bytes = max_bytes
+        self.evict_to_budget()
+
+    def evict_matching(self, predicate):
+        """
+        Drops every pixmap whose path matches, such as the art of a theme pack that isn't showing anymore
+        :param predicate: Called with each path, returns True to evict it
+        """
+        for key in [key for key in self.pixmaps if predicate(key[0])]:
+            self.current_bytes -= self.pixmap_bytes(self.pixmaps.pop(key))
+            self.evictions += 1
+
+    def clear(self):
+        self.pixmaps.clear()
+        self.current_bytes = 0
+
+    def get_stats(self):
+        """
+        :return: Dictionary of cache hits, misses, evictions and memory use
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.pixmaps),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+image_cache = ImageCache()
@@ -0,0 +1,32 @@
+"""
+Starts the break reminder. Only QtCore and QtNetwork are loaded until this copy knows it's the only one, so
+launching it again while it's already up hands straight over to the running copy instead of loading every
+widget first.
+
+Usage: python -m DesktopAssistant.Launcher
+"""
+import sys
+
+from DesktopAssistant.ControlServer import ControlServer, send_command
+
+
+def main():
+    # Claim the single instance before loading anything, so two launches close together can't both start
+    server = ControlServer()
+    if not server.claim():
+        # Just point the user at the copy that's already running
+        send_command("activate")
+        return 0
+
+    from PyQt6.QtWidgets import QApplication
+    from DesktopAssistant.DesktopAssistantGUI import DesktopAssistantGUI
+
+    app = QApplication(sys.argv)
+    if not server.listen():
+        return 1
+    DesktopAssistantGUI(app, server)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,128 +1,663 @@
-import random
-from pathlib import Path
-
-from PIL import Image
-from PIL.ImageQt import ImageQt
-from PyQt6.QtCore import QTimer
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtWidgets import QWidget, QLabel
-
-
-class LinearAnimatedBreak(QWidget):
-    """
-    Widget that shows Linear reading a book during the break. Has a lot of specific timing
-    information for when she should look at you and smile and blink, it's kind of silly
-    amounts of little tweaks
-    """
-
-    def __init__(self, width, height, image_dir, *args, **kwargs):
-        super(LinearAnimatedBreak, self).__init__(*args, **kwargs)
-
-        self.width = width
-        self.height = height
-        self.resize(self.width, self.height)
-
-        self.current_index = 0
-        self.page_read_counter = 0
-        self.current_name = ""
-        self.PAGE_READ_SPEED = 5
-        self.ANIMATION_SPEED = 500
-        self.BLINK_MIN = 4
-        self.BLINK_MAX = 10
-        self.next_blink = random.randint(self.BLINK_MIN, self.BLINK_MAX)
-
-        # Create main stage label
-        self.image_label = QLabel(parent=self)
-        self.image_label.move(200, 270)
-
-        # Load all the images from the base directory
-        self.images = {}
-        self.images_closed = {}
-        for path in Path(image_dir).glob("*.png"):
-            # Filenames are in the format of "Descriptive_Title_EyeStatus_Index.png"
-            name = "".join(path.name.split("_")[:-2])
-            eye_status = path.name.split("_")[-2]
-            index = int(path.name.split(".")[0][-1:])
-
-            if name not in self.images:
-                self.images[name] = {}
-                self.images_closed[name] = {}
-
-            # Load the image, then save off the reference
-            image = Image.open(path.absolute())
-            image = image.resize((400, 400))
-
-            if eye_status == "Closed":
-                self.images_closed[name][index] = image
-            else:
-                self.images[name][index] = image
-
-        # Load up a random default image
-        self.randomize_image_name()
-        self.update_image()
-
-        # Set up the update timer
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.animation_update)
-        self.timer.start(self.ANIMATION_SPEED)
-
-    def randomize_image_name(self):
-        """
-        Sets the current image to use during the render step. Favors reading more than looking at the user.
-        """
-        # Artificial weight to make staring less common
-        for x in range(1, 4):
-            self.current_name = random.choice(list(self.images.keys()))
-            if "Smile" not in self.current_name:
-                break
-
-    def animation_update(self):
-        """
-        Updates the current index and frame names to be used by the update_image function
-        """
-        # Delay so Linear reads the current page for a while
-        if self.current_index == 0:
-            if self.page_read_counter < self.PAGE_READ_SPEED:
-                self.page_read_counter += 1
-
-                # Update the image so that blinking can happen during the reading phase
-                self.update_image()
-                return
-
-            # If page reading is finished, reset the counter and start the page turn animation
-            self.page_read_counter = 0
-
-        # Check to see if we're at the end of the animation
-        self.current_index += 1
-        if self.current_index >= len(self.images[self.current_name]):
-            self.current_index = 0
-            self.randomize_image_name()
-
-        self.update_image()
-
-    def update_image(self):
-        """
-        Renders the next image in the animation sequence. If the blink timer is reached,
-        the blink version of the frame is used and a new blink timer is set.
-        """
-        self.next_blink -= 1
-        if self.next_blink <= 0:
-            self.next_blink = random.randint(self.BLINK_MIN, self.BLINK_MAX)
-            image = self.images_closed[self.current_name][self.current_index]
-        else:
-            image = self.images[self.current_name][self.current_index]
-        self.image_label.setPixmap(QPixmap.fromImage(ImageQt(image)))
-
-    def hide(self):
-        """
-        Overrides the default hide to turn off the animation timer first.
-        """
-        self.timer.stop()
-        super(LinearAnimatedBreak, self).hide()
-
-    def show(self):
-        """
-        Overrides the default show to turn on the animation timer first
-        """
-        self.timer.start(self.ANIMATION_SPEED)
-        super(LinearAnimatedBreak, self).show()
+import random
+import time
+from fractions import Fraction
+from pathlib import Path
+
+from PyQt6.QtCore import QPoint, QRect, QTimer
+from PyQt6.QtGui import QPainter, QPixmap
+from PyQt6.QtWidgets import QWidget, QLabel
+
+from DesktopAssistant.AnimatedImage import FrameStream, find_animations
+from DesktopAssistant.AnimationTimeline import AnimationTimeline
+from DesktopAssistant.AssetLoader import AssetLoader, get_asset_loader, trim_memory
+from DesktopAssistant.Diagnostics import diagnostics
+from DesktopAssistant.SceneCompositor import SceneLayer
+from DesktopAssistant.SpriteAtlas import get_sprite_key, sprite_atlas
+
+
+def get_matching_prefix_length(first, second):
+    """
+    :return: How many bytes at the start of two equal length byte strings are the same
+    """
+    low, high = 0, len(first)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[:middle] == second[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def find_changed_rect(first, second):
+    """
+    Finds the smallest rectangle that holds every pixel that differs between two images of the same size
+    and format
+    :param first: QImage to compare
+    :param second: QImage to compare
+    :return: The QRect of the changes, or None if the images are the same
+    """
+    bytes_per_line = first.bytesPerLine()
+    bytes_per_pixel = first.depth() // 8
+    row_length = first.width() * bytes_per_pixel
+    first_bits = first.constBits().asstring(first.sizeInBytes())
+    second_bits = second.constBits().asstring(second.sizeInBytes())
+
+    top = bottom = None
+    left, right = first.width(), -1
+    for y in range(first.height()):
+        start = y * bytes_per_line
+        first_row = first_bits[start:start + row_length]
+        second_row = second_bits[start:start + row_length]
+        if first_row == second_row:
+            continue
+
+        if top is None:
+            top = y
+        bottom = y
+
+        # Compare from both ends of the row to find how far across the changes go
+        left = min(left, get_matching_prefix_length(first_row, second_row) // bytes_per_pixel)
+        end = row_length - get_matching_prefix_length(first_row[::-1], second_row[::-1])
+        right = max(right, (end - 1) // bytes_per_pixel)
+
+    if top is None:
+        return None
+    return QRect(QPoint(left, top), QPoint(right, bottom))
+
+
+def align_rect(rect, scale, bounds):
+    """
+    Grows a rectangle of pixels so its edges also land on whole pixels once divided by the device pixel ratio
+    :param rect: QRect in pixels
+    :param scale: Device pixel ratio
+    :param bounds: QRect the result has to stay inside
+    :return: The aligned QRect
+    """
+    step = Fraction(scale).limit_denominator(8).numerator
+    left = rect.left() // step * step
+    top = rect.top() // step * step
+    right = -(-(rect.right() + 1) // step) * step
+    bottom = -(-(rect.bottom() + 1) // step) * step
+    return QRect(left, top, right - left, bottom - top).intersected(bounds)
+
+
+class LinearAnimatedBreak(QWidget):
+    """
+    Widget that shows Linear reading a book during the break. Has a lot of specific timing
+    information for when she should look at you and smile and blink, it's kind of silly
+    amounts of little tweaks
+    """
+
+    def __init__(self, width, height, image_dir, *args, rng=None, compositor=None, preload=True, leader=None,
+                 **kwargs):
+        """
+        :param compositor: SceneCompositor to draw the frames with, or None to use labels
+        :param preload: Whether to start loading the frames right away, instead of on the first prefetch
+        :param leader: Another LinearAnimatedBreak to mirror, such as the one on the primary screen. Mirrors
+        show the leader's frames as it animates, without loading any frames or running a timer of their own
+        """
+        super(LinearAnimatedBreak, self).__init__(*args, **kwargs)
+
+        self.width = width
+        self.height = height
+        self.resize(self.width, self.height)
+
+        self.PAGE_READ_SPEED = 5
+        self.BASE_ANIMATION_SPEED = 500
+        self.ANIMATION_SPEED = self.BASE_ANIMATION_SPEED
+        self.MIN_FRAME_TIME = 0
+        self.BLINK_MIN = 4
+        self.BLINK_MAX = 10
+        self.rng = rng or random.Random()
+
+        # The timeline is made once the frames are loaded, since it needs to know the sequences
+        self.timeline = None
+
+        # Counts how many times the animation timer has woken up, to keep an eye on power use
+        self.animation_wakeups = 0
+
+        # Counts how many QImage -> QPixmap conversions have happened. Everything but animated images should
+        # be converted at load time, so the per tick count should stay at 0 once the animation is running
+        # unless one of those is playing
+        self.pixmap_conversions = 0
+        self.tick_pixmap_conversions = 0
+
+        # Counts how many times an animated image's next frame wasn't decoded in time, so the last one was held
+        self.stream_underruns = 0
+
+        # Create main stage label. With a compositor, the frames are layers under a parent layer that's shown
+        # and hidden along with this widget
+        self.portrait_layer = None
+        if compositor:
+            self.portrait_layer = SceneLayer(compositor)
+            self.image_label = SceneLayer(compositor, self.portrait_layer)
+        else:
+            self.image_label = QLabel(parent=self)
+        self.image_label.move(200, 270)
+
+        # Frames can arrive after the label is first shown, so it can't size itself to them
+        self.image_label.resize(400, 400)
+        self.set_pixmap = diagnostics.wrap("animation.pixmap_swap", self.image_label.setPixmap)
+
+        # Blinks are drawn by laying a small closed eye patch over the open frame, so only that patch
+        # ever needs repainting
+        if compositor:
+            self.eye_label = SceneLayer(compositor, self.image_label)
+        else:
+            self.eye_label = QLabel(parent=self.image_label)
+        self.eye_label.hide()
+
+        # Set up the update timer. It's only armed for the next visible change rather than every tick
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(diagnostics.wrap("animation.tick", self.animation_update))
+        self.timer_expected = 0
+
+        self.leader = leader
+        self.mirrors = []
+        if leader is not None:
+            leader.mirrors.append(self)
+
+        # Frames only stay in memory around breaks, see prefetch_frames and release_frames
+        self.image_dir = image_dir
+        self.load_generation = 0
+        self.frames_requested = False
+        self.streams = {}
+
+        # Closed eye patches are tiny next to the frames but slow to work out, so they're kept when the frames
+        # are let go of, and the closed eye frames aren't decoded again unless one of the files changes. Frames
+        # that can't be patched remember that, so they don't have to be compared again either.
+        # (open frame key, closed frame key) -> (version, patch, whether the whole closed frame is needed), see
+        # get_eye_patch_key
+        self.eye_patch_cache = {}
+        self.reset_frames()
+        if preload:
+            self.prefetch_frames()
+
+    def remove_mirror(self, mirror):
+        """
+        Stops sending frames to a mirror, such as one on a screen that was unplugged
+        """
+        self.mirrors.remove(mirror)
+        mirror.clear_frame()
+
+    def set_image_dir(self, image_dir):
+        """
+        Switches to the frames in another directory. They're loaded right away if the current ones are in
+        memory or on their way, otherwise the next prefetch picks them up
+        :param image_dir: Directory the frames are in
+        """
+        self.image_dir = image_dir
+        if self.frames_requested and self.leader is None:
+            self.load_frames()
+
+    def prefetch_frames(self):
+        """
+        Starts decoding the frames in the background, unless they're already in memory or on their way.
+        Mirrors leave it to their leader
+        """
+        if not self.frames_requested and self.leader is None:
+            self.load_frames()
+
+    def release_frames(self):
+        """
+        Lets go of every decoded frame, including the ones the labels are showing. Anything still loading is
+        ignored when it arrives. The closed eye patches are kept for next time
+        """
+        if not self.frames_requested:
+            return
+
+        self.frames_requested = False
+        self.reset_frames()
+        for view in [self] + self.mirrors:
+            view.clear_frame()
+        trim_memory()
+
+    def clear_frame(self):
+        """
+        Lets go of the frame on screen
+        """
+        self.shown_frame = None
+        self.image_label.setPixmap(QPixmap())
+        self.eye_label.setPixmap(QPixmap())
+        self.eye_label.hide()
+
+    def reset_frames(self):
+        self.timer.stop()
+        self.timeline = None
+        self.shown_frame = None
+        self.frames_loaded = False
+        self.eye_label.hide()
+
+        # Anything still on its way from an earlier load gets ignored
+        self.load_generation += 1
+
+        self.images = {}
+        self.images_closed = {}
+        self.eye_patches = {}
+        self.decoded_frames = {}
+        self.frame_names = {}
+
+        # (name, index) -> {"open": path, "closed": path}
+        self.frame_paths = {}
+
+        # Animated images are streamed rather than loaded, sequence name -> FrameStream
+        for stream in self.streams.values():
+            stream.close()
+        self.streams = {}
+        self.streaming_name = None
+
+    def load_frames(self):
+        """
+        Finds all the frames in the image directory and starts loading them, replacing any frames already
+        loaded. Decoding happens in the background through the asset loader, and the animation holds off until
+        every frame has arrived. Animated images only have their first few frames loaded, see FrameStream
+        """
+        self.reset_frames()
+        self.frames_requested = True
+        generation = self.load_generation
+
+        for path, name, eye_status, index in sprite_atlas.get_frames(self.image_dir):
+            if name not in self.images:
+                self.images[name] = {}
+                self.images_closed[name] = {}
+                self.eye_patches[name] = {}
+
+            self.frame_names[path] = (name, eye_status, index)
+            self.frame_paths.setdefault((name, index), {})["closed" if eye_status == "Closed" else "open"] = path
+
+        requests = []
+        patch_keys = set()
+        for (name, index), paths in self.frame_paths.items():
+            patch_key = self.get_eye_patch_key(name, index)
+            record = self.eye_patch_cache.get(patch_key[0]) if patch_key else None
+            if record is not None and record[0] == patch_key[1]:
+                # Already know how the eyes close, so the closed eye frame is only needed if it's drawn whole
+                eye_patch, full_closed = record[1:]
+                self.decoded_frames[(name, index)] = {"eye_patch": eye_patch, "full_closed": full_closed}
+                if not full_closed:
+                    paths = {"open": paths["open"]}
+            if patch_key:
+                patch_keys.add(patch_key[0])
+            requests += [(path, (400, 400)) for path in paths.values()]
+
+        # Patches from frames that are gone or from another pack would only be dead weight
+        self.eye_patch_cache = {files_key: record for files_key, record in self.eye_patch_cache.items()
+                                if files_key in patch_keys}
+
+        for path, name in find_animations(self.image_dir):
+            if name in self.images or name in self.streams:
+                print(f"Skipping {path}, there's already a {name} sequence")
+                continue
+            self.streams[name] = FrameStream(path, (400, 400), get_asset_loader().device_pixel_ratio,
+                                             self.convert_to_pixmap)
+
+        def on_frame(path, image):
+            if generation == self.load_generation:
+                self.add_frame(path, image)
+
+        # Waits on the numbered frames and every stream
+        remaining = [len(self.streams) + 1]
+
+        def on_finished():
+            remaining[0] -= 1
+            if remaining[0] == 0 and generation == self.load_generation:
+                self.on_frames_loaded()
+
+        get_asset_loader().request_all(requests, on_frame, on_finished)
+        for stream in self.streams.values():
+            stream.open(on_finished)
+
+    def add_frame(self, path, image, decoded_frames=None):
+        """
+        Holds onto a decoded frame until its open or closed eye partner arrives
+        :param path: Path the frame was loaded from
+        :param image: Decoded QImage for the frame
+        :param decoded_frames: Dictionary to hold it in, if not the one for the whole load
+        """
+        name, eye_status, index = self.frame_names[path]
+        decoded_frames = self.decoded_frames if decoded_frames is None else decoded_frames
+        frame = decoded_frames.setdefault((name, index), {})
+        frame["closed" if eye_status == "Closed" else "open"] = image
+
+    def build_frames(self):
+        """
+        Converts every open eye frame to a pixmap once, and cuts each closed eye frame down to just the part
+        that differs from its open frame. The eyes sit inside the opaque face, so drawing that patch over the
+        open frame gives back the closed frame
+        """
+        for (name, index), frame in self.decoded_frames.items():
+            self.build_frame(name, index, frame)
+
+        # The frame names are kept so art that changes on disk can be matched back to its frame
+        self.decoded_frames = {}
+
+    def build_frame(self, name, index, frame):
+        """
+        Converts one frame's open eye image and builds its closed eye patch, replacing whatever was there
+        :param name: Sequence name
+        :param index: Index of the frame in the sequence
+        :param frame: Dictionary with the decoded "open" and, if it has one, "closed" QImage. If the closed eye
+        frame's patch is cached, "eye_patch" holds it and "full_closed" says whether to use the whole closed
+        frame instead, which is then only decoded if it's needed
+        """
+        if "open" not in frame:
+            print(f"Error loading frames: {name} {index} has no open eye frame")
+            return
+
+        pixmap = self.convert_to_pixmap(frame["open"])
+        closed_pixmap = None
+        eye_patch = frame.get("eye_patch")
+        if "closed" in frame and frame.get("full_closed"):
+            closed_pixmap = self.convert_to_pixmap(frame["closed"].convertToFormat(frame["open"].format()))
+        elif "closed" in frame:
+            closed = frame["closed"].convertToFormat(frame["open"].format())
+            changed_rect = find_changed_rect(frame["open"], closed)
+            if changed_rect is not None:
+                # The patch is placed in logical pixels, so on high DPI screens it has to start on one
+                scale = frame["open"].devicePixelRatio()
+                changed_rect = align_rect(changed_rect, scale, frame["open"].rect())
+                offset = QPoint(round(changed_rect.x() / scale), round(changed_rect.y() / scale))
+
+                patch = closed.copy(changed_rect)
+                patch.setDevicePixelRatio(scale)
+                if self.is_patch_exact(frame["open"], patch, changed_rect, closed):
+                    eye_patch = (offset, self.convert_to_pixmap(patch))
+                else:
+                    # Drawing over the open frame can't make pixels more see through, so frames like that
+                    # swap out the whole image instead
+                    closed_pixmap = self.convert_to_pixmap(closed)
+
+            patch_key = self.get_eye_patch_key(name, index)
+            if patch_key:
+                # Whole closed frames are as big as the open ones, so only the patches are kept
+                self.eye_patch_cache[patch_key[0]] = (patch_key[1], eye_patch, closed_pixmap is not None)
+
+        self.images[name][index] = pixmap
+        self.images_closed[name].pop(index, None)
+        self.eye_patches[name].pop(index, None)
+        if closed_pixmap is not None:
+            self.images_closed[name][index] = closed_pixmap
+        if eye_patch is not None:
+            self.eye_patches[name][index] = eye_patch
+
+    def get_eye_patch_key(self, name, index):
+        """
+        :return: (files key, version) tuple a frame's closed eye patch is cached under, or None if it has no
+        closed eye frame. The version changes whenever either file does or the screen scaling changes
+        """
+        paths = self.frame_paths.get((name, index), {})
+        if len(paths) < 2:
+            return None
+
+        try:
+            stats = [Path(paths[eye_status]).stat() for eye_status in ("open", "closed")]
+        except OSError:
+            return None
+        files_key = (get_sprite_key(paths["open"]), get_sprite_key(paths["closed"]))
+        version = tuple((stat.st_mtime_ns, stat.st_size) for stat in stats) + (get_asset_loader().device_pixel_ratio,)
+        return files_key, version
+
+    @staticmethod
+    def is_patch_exact(open_image, patch, rect, closed_image):
+        """
+        :return: Whether drawing the patch over the open frame gives back exactly the closed frame
+        """
+        result = open_image.copy(rect)
+        result.setDevicePixelRatio(patch.devicePixelRatio())
+        painter = QPainter(result)
+        painter.drawImage(0, 0, patch)
+        painter.end()
+        return result == closed_image.copy(rect)
+
+    def on_frames_loaded(self):
+        """
+        Called once every frame has been decoded. Loads up a random default image
+        """
+        self.build_frames()
+        self.streams = {name: stream for name, stream in self.streams.items() if stream.delays}
+        self.frames_loaded = True
+        self.timeline = AnimationTimeline(self.get_sequences(), self.PAGE_READ_SPEED, self.BLINK_MIN, self.BLINK_MAX,
+                                          self.rng)
+        self.update_image()
+
+        if self.isVisible():
+            self.schedule_next_update()
+
+    def reload_files(self, paths):
+        """
+        Picks up frames that changed on disk. Each changed frame is decoded again in the background and swapped
+        in once it's ready, without touching the timer, so the animation doesn't miss a tick. Frames or
+        animations being added or removed means the sequences change, so the whole directory is loaded again
+        :param paths: Paths of the files that changed, already dropped from the caches
+        """
+        if self.leader is not None or not self.frames_requested:
+            return
+
+        image_dir = get_sprite_key(self.image_dir)
+        paths = [path for path in paths if get_sprite_key(Path(path).parent) == image_dir]
+        if not paths:
+            return
+
+        frame_paths = {get_sprite_key(path): path for path in self.frame_names}
+        stream_names = {get_sprite_key(stream.path): name for name, stream in self.streams.items()}
+        listed = [path for path, *frame in sprite_atlas.get_frames(self.image_dir)]
+        listed += [path for path, name in find_animations(self.image_dir)]
+        listed = {get_sprite_key(path) for path in listed}
+        if not self.frames_loaded or listed != frame_paths.keys() | stream_names.keys():
+            self.load_frames()
+            return
+
+        generation = self.load_generation
+        changed_frames = set()
+        for path in paths:
+            key = get_sprite_key(path)
+            if key in frame_paths:
+                name, eye_status, index = self.frame_names[frame_paths[key]]
+                changed_frames.add((name, index))
+            elif key in stream_names:
+                self.reload_stream(generation, stream_names[key])
+
+        for name, index in changed_frames:
+            self.reload_frame(generation, name, index)
+
+    def reload_frame(self, generation, name, index):
+        """
+        Decodes a frame and its closed eye partner again, then swaps them in together
+        """
+        requests = [(path, (400, 400)) for path, (frame_name, eye_status, frame_index) in self.frame_names.items()
+                    if (frame_name, frame_index) == (name, index)]
+        decoded_frames = {}
+
+        def on_frame(path, image):
+            if generation == self.load_generation and not image.isNull():
+                self.add_frame(path, image, decoded_frames)
+
+        def on_finished():
+            # Keep the old frame if either file couldn't be read, it's likely only half written
+            frame = decoded_frames.get((name, index), {})
+            if generation == self.load_generation and len(frame) == len(requests):
+                self.build_frame(name, index, frame)
+                self.on_frame_reloaded(name, index)
+
+        get_asset_loader().request_all(requests, on_frame, on_finished, AssetLoader.PRIORITY_HIGH)
+
+    def reload_stream(self, generation, name):
+        """
+        Opens an animated image again, swapping it in once its first frames are ready
+        """
+        old_stream = self.streams[name]
+        stream = FrameStream(old_stream.path, old_stream.size, old_stream.scale, self.convert_to_pixmap)
+
+        def on_opened():
+            # Keep the old one playing if the new one can't be read, it's likely only half written
+            if generation != self.load_generation or self.streams.get(name) is not old_stream or not stream.delays:
+                stream.close()
+                return
+
+            old_stream.close()
+            self.streams[name] = stream
+            self.timeline.set_sequences(self.get_sequences())
+            self.on_frame_reloaded(name, self.timeline.current_index)
+
+        stream.open(on_opened)
+
+    def on_frame_reloaded(self, name, index):
+        # Only the picture is swapped, the timer carries on as it was
+        if (self.timeline.current_name, self.timeline.current_index) == (name, index):
+            self.update_image()
+
+    def get_sequences(self):
+        """
+        :return: Dictionary of sequence name to frame count for the timeline, or for animated images, to the
+        ticks each frame is shown for
+        """
+        sequences = {name: len(frames) for name, frames in self.images.items()}
+        for name, stream in self.streams.items():
+            sequences[name] = [Fraction(max(delay, self.MIN_FRAME_TIME), self.ANIMATION_SPEED)
+                               for delay in stream.delays]
+        return sequences
+
+    def convert_to_pixmap(self, image):
+        """
+        Converts a decoded image into a pixmap that can be handed straight to a label
+        :param image: QImage to convert
+        :return: The converted QPixmap
+        """
+        self.pixmap_conversions += 1
+        self.tick_pixmap_conversions += 1
+        return QPixmap.fromImage(image)
+
+    def set_power_profile(self, max_fps, blink_min, blink_max):
+        """
+        Applies the power settings from the config
+        :param max_fps: Most frames per second to show, 0 for no limit
+        :param blink_min: Minimum milliseconds between blinks
+        :param blink_max: Maximum milliseconds between blinks, 0 to never blink
+        """
+        self.ANIMATION_SPEED = self.BASE_ANIMATION_SPEED
+        self.MIN_FRAME_TIME = 0
+        if max_fps > 0:
+            self.ANIMATION_SPEED = max(self.BASE_ANIMATION_SPEED, 1000 // max_fps)
+
+            # Animated images have faster frames of their own, which are slowed down to the cap instead
+            self.MIN_FRAME_TIME = 1000 // max_fps
+
+        self.BLINK_MIN = max(1, round(blink_min / self.ANIMATION_SPEED))
+        self.BLINK_MAX = 0
+        if blink_max > 0:
+            self.BLINK_MAX = max(self.BLINK_MIN, round(blink_max / self.ANIMATION_SPEED))
+
+        if self.timeline:
+            self.timeline.set_sequences(self.get_sequences())
+            self.timeline.set_blink_range(self.BLINK_MIN, self.BLINK_MAX)
+
+    def get_update_delay(self):
+        """
+        :return: Milliseconds until the picture next changes
+        """
+        return round(self.timeline.get_ticks_until_change() * self.ANIMATION_SPEED)
+
+    def schedule_next_update(self):
+        """
+        Arms the timer for the next time the picture actually changes
+        """
+        delay = self.get_update_delay()
+        self.timer_expected = time.perf_counter() + delay / 1000
+        self.timer.start(delay)
+
+    def animation_update(self):
+        """
+        Moves the timeline on to the next visible change, shows it, then waits for the one after
+        """
+        self.tick_pixmap_conversions = 0
+        self.animation_wakeups += 1
+        if diagnostics.enabled:
+            diagnostics.record("animation.timer_lag", max(0.0, (time.perf_counter() - self.timer_expected) * 1000))
+
+        if not self.frames_loaded:
+            return
+
+        self.timeline.advance()
+        self.update_image()
+        self.schedule_next_update()
+
+    def update_image(self):
+        """
+        Renders the current image in the animation sequence, laying the closed eye patch over it
+        if the timeline says the eyes are closed.
+        Frames are already converted to pixmaps, so this only swaps which ones the labels show, and
+        a blink on its own only repaints the patch.
+        """
+        name, index = self.timeline.current_name, self.timeline.current_index
+        if name != self.streaming_name and self.streaming_name in self.streams:
+            self.streams[self.streaming_name].rewind()
+        self.streaming_name = name if name in self.streams else None
+
+        if self.streaming_name:
+            pixmap, eye_patch = self.get_streamed_frame(self.streams[name], index), None
+        else:
+            eyes_closed = self.timeline.eyes_closed
+            full_closed_frame = eyes_closed and index in self.images_closed[name]
+            pixmap = self.images_closed[name][index] if full_closed_frame else self.images[name][index]
+            eye_patch = self.eye_patches[name].get(index) if eyes_closed else None
+
+        # Mirrors share the same pixmaps, so every screen shows the frame without converting it again
+        for view in [self] + self.mirrors:
+            view.show_frame(pixmap, eye_patch)
+
+    def get_streamed_frame(self, stream, index):
+        """
+        :return: An animated image's frame, or the frame already on screen if it hasn't been decoded in time
+        """
+        stream.seek(index)
+        pixmap = stream.get_frame(index)
+        if pixmap is None:
+            # Better to hold the last frame for a moment than to stall the whole animation waiting on it
+            self.stream_underruns += 1
+            pixmap = self.shown_frame
+        return pixmap
+
+    def show_frame(self, pixmap, eye_patch):
+        """
+        :param pixmap: Frame to show
+        :param eye_patch: (offset, pixmap) tuple of the closed eye patch to lay over it, or None
+        """
+        if pixmap is not self.shown_frame:
+            self.shown_frame = pixmap
+            self.set_pixmap(pixmap)
+
+        if eye_patch:
+            offset, pixmap = eye_patch
+            self.eye_label.setPixmap(pixmap)
+            self.eye_label.resize(pixmap.deviceIndependentSize().toSize())
+            self.eye_label.move(offset)
+            self.eye_label.show()
+        else:
+            self.eye_label.hide()
+
+    def hide(self):
+        """
+        Overrides the default hide to turn off the animation timer first. The frames are only shown during
+        breaks, so they're let go of too until the next prefetch
+        """
+        self.timer.stop()
+        self.release_frames()
+        if self.portrait_layer:
+            self.portrait_layer.hide()
+        super(LinearAnimatedBreak, self).hide()
+
+    def show(self):
+        """
+        Overrides the default show to turn on the animation timer first, or start loading the frames if
+        nobody prefetched them
+        """
+        self.prefetch_frames()
+        if self.frames_loaded:
+            self.schedule_next_update()
+        if self.leader is not None and self.leader.frames_loaded:
+            self.leader.update_image()
+        if self.portrait_layer:
+            self.portrait_layer.show()
+        super(LinearAnimatedBreak, self).show()
@@ -0,0 +1,185 @@
+from PyQt6.QtCore import QObject, QPoint, QRect, QSize, Qt, pyqtProperty
+from PyQt6.QtGui import QPainter, QPixmap
+from PyQt6.QtWidgets import QStyle, QStyleOptionProgressBar, QWidget
+
+from DesktopAssistant.Diagnostics import diagnostics
+
+
+class SceneLayer(QObject):
+    """
+    A pixmap drawn by a SceneCompositor. It has the same move, show, hide and setPixmap calls and pos property
+    as the QLabel it stands in for, so the slide animations and the code driving them work with either one.
+    Positions are relative to the parent layer, like child widgets.
+    """
+
+    def __init__(self, compositor, parent_layer=None):
+        super(SceneLayer, self).__init__(parent_layer or compositor)
+
+        self.compositor = compositor
+        self.parent_layer = parent_layer
+        self.child_layers = []
+        if parent_layer is not None:
+            parent_layer.child_layers.append(self)
+
+        self.position = QPoint(0, 0)
+        self.current_pixmap = QPixmap()
+        self.visible = True
+        compositor.add_layer(self)
+
+    def get_pos(self):
+        return QPoint(self.position)
+
+    def move(self, x, y=None):
+        position = QPoint(x, y) if y is not None else QPoint(x)
+        if position == self.position:
+            return
+
+        self.mark_dirty()
+        self.position = position
+        self.mark_dirty()
+
+    # Lets QPropertyAnimation slide layers around the same way it does widgets
+    pos = pyqtProperty(QPoint, fget=get_pos, fset=move)
+
+    def show(self):
+        if not self.visible:
+            self.visible = True
+            self.mark_dirty()
+
+    def hide(self):
+        if self.visible:
+            self.mark_dirty()
+            self.visible = False
+
+    def isVisible(self):
+        return self.visible and (self.parent_layer is None or self.parent_layer.isVisible())
+
+    def setPixmap(self, pixmap):
+        self.mark_dirty()
+        self.current_pixmap = pixmap
+        self.mark_dirty()
+
+    def pixmap(self):
+        return self.current_pixmap
+
+    def resize(self, *size):
+        # Layers are always the size of their pixmap, this is only here to match QLabel
+        pass
+
+    def get_scene_pos(self):
+        """
+        :return: Position in the compositor, after adding up every parent layer's position
+        """
+        if self.parent_layer is None:
+            return QPoint(self.position)
+        return self.parent_layer.get_scene_pos() + self.position
+
+    def get_rect(self):
+        """
+        :return: Area the layer covers in the compositor, not counting its children
+        """
+        return QRect(self.get_scene_pos(), self.current_pixmap.deviceIndependentSize().toSize())
+
+    def mark_dirty(self):
+        """
+        Asks for the area under this layer and its children to be repainted, if any of it is showing
+        """
+        if not self.isVisible():
+            return
+        self.compositor.update(self.get_rect())
+        for child in self.child_layers:
+            child.mark_dirty()
+
+    def paint(self, painter, dirty_rect):
+        rect = self.get_rect()
+        if not self.current_pixmap.isNull() and rect.intersects(dirty_rect):
+            painter.drawPixmap(rect.topLeft(), self.current_pixmap)
+
+
+class ProgressLayer(SceneLayer):
+    """
+    Progress bar drawn by a SceneCompositor with the current style, standing in for a QProgressBar. Only the
+    bar itself is repainted when the value changes
+    """
+
+    def __init__(self, compositor, parent_layer=None):
+        super(ProgressLayer, self).__init__(compositor, parent_layer)
+
+        self.size = (0, 0)
+        self.value = 0
+        self.text_format = ""
+        self.alignment = Qt.AlignmentFlag.AlignLeft
+
+    def resize(self, width, height):
+        self.mark_dirty()
+        self.size = (width, height)
+        self.mark_dirty()
+
+    def setAlignment(self, alignment):
+        self.alignment = alignment
+        self.mark_dirty()
+
+    def setFormat(self, text_format):
+        self.text_format = text_format
+        self.mark_dirty()
+
+    def setValue(self, value):
+        if value != self.value:
+            self.value = value
+            self.mark_dirty()
+
+    def get_rect(self):
+        return QRect(self.get_scene_pos(), QSize(*self.size))
+
+    def paint(self, painter, dirty_rect):
+        rect = self.get_rect()
+        if not rect.intersects(dirty_rect):
+            return
+
+        option = QStyleOptionProgressBar()
+        option.initFrom(self.compositor)
+        option.rect = rect
+        option.minimum = 0
+        option.maximum = 100
+        option.progress = self.value
+        option.text = self.text_format
+        option.textVisible = bool(self.text_format)
+        option.textAlignment = self.alignment
+        option.state |= QStyle.StateFlag.State_Horizontal
+        # The style can draw a little outside the rect, which a real progress bar would clip
+        painter.save()
+        painter.setClipRect(rect)
+        self.compositor.style().drawControl(QStyle.ControlElement.CE_ProgressBar, option, painter, self.compositor)
+        painter.restore()
+
+
+class SceneCompositor(QWidget):
+    """
+    Draws a whole scene of layers from their cached pixmaps in one paintEvent, instead of a stack of
+    translucent QLabels that all have to be blended separately. Every change to a layer only marks the area
+    it covered and now covers as dirty, so a slide step or a blink only repaints the pixels that moved.
+    Layers are drawn in the order they were made, the first one at the back.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SceneCompositor, self).__init__(*args, **kwargs)
+
+        self.layers = []
+
+        # The widgets on top of the scene still handle the mouse
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+
+    def add_layer(self, layer):
+        # New layers don't have anything to draw yet, so there's nothing to repaint
+        self.layers.append(layer)
+
+    def paintEvent(self, event):
+        dirty_rect = event.rect()
+        if diagnostics.enabled:
+            diagnostics.record("scene.repaint_pixels", dirty_rect.width() * dirty_rect.height(), "px")
+
+        painter = QPainter(self)
+        for layer in self.layers:
+            if layer.isVisible():
+                layer.paint(painter, dirty_rect)
+        painter.end()
@@ -0,0 +1,196 @@
+import atexit
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+
+def get_day_key(timestamp):
+    return date.fromtimestamp(timestamp).isoformat()
+
+
+def get_week_key(timestamp):
+    """
+    :return: The ISO week a time falls in, such as "2026-W42"
+    """
+    year, week, weekday = date.fromtimestamp(timestamp).isocalendar()
+    return f"{year}-W{week:02}"
+
+
+class SessionHistory:
+    """
+    Append only log of every state the break reminder goes through, kept in a local SQLite file. Events are
+    queued from the GUI thread and written in batches by a background thread, which keeps daily and weekly
+    counts of each state up to date in the same transaction. The stats only ever read those rollups, so
+    they stay instant no matter how many months are in the log.
+    """
+    FILENAME = "history.sqlite3"
+
+    # How long to collect events before writing them out
+    BATCH_DELAY = 5
+
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS events (time REAL NOT NULL, state TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS events_time ON events (time)",
+        "CREATE TABLE IF NOT EXISTS daily (period TEXT NOT NULL, state TEXT NOT NULL, count INTEGER NOT NULL, "
+        "PRIMARY KEY (period, state)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS weekly (period TEXT NOT NULL, state TEXT NOT NULL, count INTEGER NOT NULL, "
+        "PRIMARY KEY (period, state)) WITHOUT ROWID",
+    ]
+
+    # Rollup table -> function turning an event time into its period
+    ROLLUPS = {"daily": get_day_key, "weekly": get_week_key}
+
+    def __init__(self, filename=FILENAME, clock=time.time):
+        """
+        :param filename: SQLite file to keep the history in
+        :param clock: Returns the current time in seconds since the epoch
+        """
+        self.filename = filename
+        self.clock = clock
+
+        self.pending = []
+        self.writing = []
+        self.condition = threading.Condition()
+
+        # Set by flush so the writer doesn't wait out the rest of the batch
+        self.flush_requested = False
+
+        # Held while a batch is committed, so stats never count a batch both from the file and from memory.
+        # The GUI thread only takes it to read the stats, queueing events never waits on a commit
+        self.commit_lock = threading.Lock()
+        self.read_connection = None
+
+        self.thread = threading.Thread(target=self.run, name="SessionHistory", daemon=True)
+        self.thread.start()
+
+        # Don't lose the last few events when the app closes
+        atexit.register(self.flush)
+
+    def record_state(self, state):
+        """
+        Queues a state change to be logged. Meant to be connected to BreakReminderWidget.state_changed
+        :param state: One of the BreakReminderWidget.STATE_* or EVENT_* names
+        """
+        with self.condition:
+            self.pending.append((self.clock(), state))
+
+            # Only the first event of a batch wakes the writer, the rest just join it
+            if len(self.pending) == 1:
+                self.condition.notify_all()
+
+    def flush(self):
+        """
+        Blocks until every queued event has been written, or gives up if the writer thread isn't running
+        """
+        with self.condition:
+            if self.pending:
+                self.flush_requested = True
+                self.condition.notify_all()
+            while (self.pending or self.writing) and self.thread.is_alive():
+                self.condition.wait(0.1)
+
+    def connect(self):
+        connection = sqlite3.connect(self.filename)
+        connection.execute("PRAGMA journal_mode=WAL")
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        connection.commit()
+        return connection
+
+    def run(self):
+        try:
+            connection = self.connect()
+        except sqlite3.Error as error:
+            print(f"Error opening {self.filename}, session history won't be saved: {error}")
+            connection = None
+
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+                # Let a few more events pile up so they go out in one transaction. Waits can end early from
+                # other notifications, so keep going until the deadline unless a flush wants them now
+                deadline = time.monotonic() + self.BATCH_DELAY
+                while not self.flush_requested:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                self.flush_requested = False
+                self.writing = self.pending
+                self.pending = []
+
+            with self.commit_lock:
+                try:
+                    if connection is not None:
+                        self.write_events(connection, self.writing)
+                except Exception as error:
+                    # Dropping a batch is better than ending the thread, which would leave flush waiting at exit
+                    print(f"Error saving session history: {error}")
+                finally:
+                    with self.condition:
+                        self.writing = []
+                        self.condition.notify_all()
+
+    def write_events(self, connection, events):
+        """
+        Appends events to the log and adds them to the rollups, all in one transaction
+        :param events: List of (time, state) tuples
+        """
+        with connection:
+            connection.executemany("INSERT INTO events (time, state) VALUES (?, ?)", events)
+            for table, get_period in self.ROLLUPS.items():
+                connection.executemany(
+                    f"INSERT INTO {table} (period, state, count) VALUES (?, ?, 1) "
+                    f"ON CONFLICT (period, state) DO UPDATE SET count = count + 1",
+                    [(get_period(event_time), state) for event_time, state in events])
+
+    def get_counts(self, table, first_period):
+        """
+        Reads a rollup, plus anything that hasn't been written yet
+        :param table: "daily" or "weekly"
+        :param first_period: Earliest period to include
+        :return: Dictionary of period -> {state: count}
+        """
+        counts = {}
+        with self.commit_lock:
+            try:
+                if self.read_connection is None:
+                    self.read_connection = sqlite3.connect(self.filename)
+                rows = self.read_connection.execute(
+                    f"SELECT period, state, count FROM {table} WHERE period >= ?", (first_period,))
+                for period, state, count in rows:
+                    counts.setdefault(period, {})[state] = count
+            except sqlite3.Error:
+                # Nothing has been written yet
+                pass
+
+            with self.condition:
+                unsaved = self.writing + self.pending
+        get_period = self.ROLLUPS[table]
+        for event_time, state in unsaved:
+            period = get_period(event_time)
+            if period >= first_period:
+                period_counts = counts.setdefault(period, {})
+                period_counts[state] = period_counts.get(state, 0) + 1
+
+        return counts
+
+    def get_daily_counts(self, days):
+        """
+        :param days: How many days back to go, including today
+        :return: Dictionary of "YYYY-MM-DD" -> {state: count}
+        """
+        first_day = date.fromtimestamp(self.clock()) - timedelta(days=days - 1)
+        return self.get_counts("daily", first_day.isoformat())
+
+    def get_weekly_counts(self, weeks):
+        """
+        :param weeks: How many weeks back to go, including this one
+        :return: Dictionary of "YYYY-Www" -> {state: count}
+        """
+        first_week = get_week_key(self.clock() - (weeks - 1) * 7 * 24 * 60 * 60)
+        return self.get_counts("weekly", first_week)
@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+def get_session_time():
+    """
+    Milliseconds on a clock that never jumps with wall clock changes. Uses the boot time clock where there
+    is one so time spent asleep still counts, otherwise the monotonic clock (which already includes sleep
+    on Windows)
+    """
+    if hasattr(time, "CLOCK_BOOTTIME"):
+        return time.clock_gettime(time.CLOCK_BOOTTIME) * 1000
+    return time.monotonic() * 1000
+
+
+class SessionScheduler(QObject):
+    """
+    Keeps every session deadline (work, snooze, break, stand) as an absolute timestamp in a priority queue
+    and arms a single timer for whichever comes first. Callbacks are registered once up front, so nothing
+    gets connected again as the day goes on.
+    """
+    WORK = "work"
+    SNOOZE = "snooze"
+    BREAK = "break"
+    STAND = "stand"
+
+    # Qt's timers may not count time spent asleep, so never wait longer than this before checking the clock
+    # again. That way deadlines that passed while the machine was suspended still fire soon after resume.
+    MAX_TIMER_INTERVAL = 60_000
+
+    # Fired with the deadline name and how many milliseconds late it went off
+    deadline_fired = pyqtSignal(str, float)
+
+    def __init__(self, clock=get_session_time, *args, **kwargs):
+        super(SessionScheduler, self).__init__(*args, **kwargs)
+
+        self.clock = clock
+        self.callbacks = {}
+
+        # Heap of (deadline, sequence, name). Cancelled or replaced entries are left in the heap and skipped
+        # when they come up, self.deadlines holds the live (deadline, sequence) for each name
+        self.queue = []
+        self.deadlines = {}
+        self.sequence = itertools.count()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.process_deadlines)
+
+    def set_callback(self, name, callback):
+        """
+        Sets the function to call when a deadline fires
+        :param name: Deadline name, such as SessionScheduler.WORK
+        :param callback: Function called with no arguments
+        """
+        self.callbacks[name] = callback
+
+    def schedule(self, name, delay):
+        """
+        Sets a deadline, replacing any existing one with the same name
+        :param name: Deadline name, such as SessionScheduler.WORK
+        :param delay: Milliseconds from now
+        """
+        entry = (self.clock() + max(0, delay), next(self.sequence))
+        self.deadlines[name] = entry
+        heapq.heappush(self.queue, (*entry, name))
+        self.arm_timer()
+
+    def cancel(self, *names):
+        for name in names:
+            self.deadlines.pop(name, None)
+        self.arm_timer()
+
+    def is_scheduled(self, name):
+        return name in self.deadlines
+
+    def get_remaining_time(self, name):
+        """
+        :param name: Deadline name, such as SessionScheduler.WORK
+        :return: Milliseconds until the deadline, or -1 if it isn't scheduled
+        """
+        if name not in self.deadlines:
+            return -1
+        return max(0, int(self.deadlines[name][0] - self.clock()))
+
+    def get_next_deadline(self):
+        """
+        :return: Clock time of the earliest deadline, or None if nothing is scheduled
+        """
+        self.drop_stale_entries()
+        if not self.queue:
+            return None
+        return self.queue[0][0]
+
+    def drop_stale_entries(self):
+        while self.queue and self.deadlines.get(self.queue[0][2]) != self.queue[0][:2]:
+            heapq.heappop(self.queue)
+
+    def arm_timer(self):
+        """
+        Points the one timer at the earliest live deadline
+        """
+        self.drop_stale_entries()
+        if not self.queue:
+            self.timer.stop()
+            return
+
+        delay = max(0, int(self.queue[0][0] - self.clock()))
+        self.timer.start(min(delay, self.MAX_TIMER_INTERVAL))
+
+    def process_deadlines(self):
+        """
+        Fires every deadline that has passed, oldest first, then waits for the next one
+        """
+        now = self.clock()
+        self.drop_stale_entries()
+        while self.queue and self.queue[0][0] <= now:
+            deadline, sequence, name = heapq.heappop(self.queue)
+            del self.deadlines[name]
+            self.deadline_fired.emit(name, now - deadline)
+
+            callback = self.callbacks.get(name)
+            if callback:
+                callback()
+
+            # Callbacks are free to schedule or cancel, so tidy up again before looking at the next one
+            self.drop_stale_entries()
+
+        self.arm_timer()
@@ -0,0 +1,210 @@
+"""
+Runs the break reminder against a virtual clock with no window or tray, so days of work, break and stand
+cycles go by in seconds. Everything random comes from one seed, so a run can be replayed exactly.
+
+Usage: python -m DesktopAssistant.Simulation --days 7 --seed 1 --trace trace.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+from PyQt6.QtWidgets import QApplication
+
+from DesktopAssistant.AssetLoader import get_asset_loader
+from DesktopAssistant.BreakReminderWidget import BreakReminderWidget
+from DesktopAssistant.ConfigReader import ConfigReader
+from DesktopAssistant.SessionScheduler import SessionScheduler
+
+
+class VirtualClock:
+    """
+    Clock for the scheduler that only moves when the simulation says so
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Simulation:
+    """
+    Drives a BreakReminderWidget through simulated time. Whenever a prompt shows up, a pretend user picks
+    one of its buttons after a random delay. Every state change, deadline and button press is recorded
+    in the trace.
+    """
+    DAY = 24 * 60 * 60 * 1000
+
+    # How likely the pretend user is to pick each button, anything not listed has a weight of 1
+    BUTTON_WEIGHTS = {"Take Break": 6, "Snooze": 3, "Just Starting": 1}
+
+    # Longest the pretend user takes to react to a prompt
+    MAX_REACTION_TIME = 2 * 60 * 1000
+
+    def __init__(self, days, seed, config):
+        self.end_time = days * self.DAY
+        self.rng = random.Random(seed)
+        self.clock = VirtualClock()
+        self.trace = []
+
+        self.scheduler = SessionScheduler(self.clock)
+        self.scheduler.deadline_fired.connect(self.on_deadline_fired)
+
+        self.widget = BreakReminderWidget(600, 600, config, scheduler=self.scheduler,
+                                          rng=random.Random(self.rng.random()))
+        self.widget.work_count = 0
+        self.widget.state_changed.connect(self.on_state_changed)
+
+        self.next_user_action = None
+        self.next_animation_update = None
+        self.animation_updates = 0
+
+        # Wait for the art so the scene and the break animation behave like they would on screen
+        get_asset_loader().wait_for_done()
+        self.first_receivers = None
+
+    def record(self, event, **details):
+        self.trace.append({"time": round(self.clock.now), "event": event, **details})
+
+    def on_state_changed(self, state):
+        self.record("state", state=state)
+
+        if state in (BreakReminderWidget.STATE_START_PROMPT, BreakReminderWidget.STATE_BREAK_PROMPT,
+                     BreakReminderWidget.STATE_STAND_PROMPT):
+            self.next_user_action = self.clock.now + self.rng.uniform(0, self.MAX_REACTION_TIME)
+
+        if state == BreakReminderWidget.STATE_BREAK_PROMPT:
+            # The break frames are prefetched while the prompt is up, and a real user takes longer than that
+            # to react, so let them arrive
+            get_asset_loader().wait_for_done()
+        elif state == BreakReminderWidget.STATE_BREAK:
+            self.schedule_animation_update()
+        elif state == BreakReminderWidget.STATE_START_PROMPT:
+            self.next_animation_update = None
+
+        # Snapshot the connections after the first full cycle so leaks show up as growth
+        if state == BreakReminderWidget.STATE_WORK and self.first_receivers is None \
+                and self.widget.work_count >= 2:
+            self.first_receivers = self.count_receivers()
+
+    def on_deadline_fired(self, name, lateness):
+        self.record("deadline", name=name, lateness=lateness)
+
+    def schedule_animation_update(self):
+        break_portrait = self.widget.break_portrait
+        if break_portrait.timeline is None:
+            self.next_animation_update = None
+            return
+        delay = break_portrait.get_update_delay()
+        self.next_animation_update = self.clock.now + delay
+
+    def press_button(self):
+        """
+        Has the pretend user pick one of the buttons on screen
+        """
+        self.next_user_action = None
+        buttons = self.widget.dialogue_box.current_buttons
+        if not buttons:
+            return
+
+        weights = [self.BUTTON_WEIGHTS.get(button.text, 1) for button in buttons]
+        button = self.rng.choices(buttons, weights)[0]
+        self.record("button", text=button.text)
+        button.function()
+
+    def count_receivers(self):
+        """
+        :return: Dictionary of how many slots are connected to the signals that fire every cycle
+        """
+        counts = {
+            "scheduler_timer": self.scheduler.timer.receivers(self.scheduler.timer.timeout),
+            "animation_timer": self.widget.break_portrait.timer.receivers(self.widget.break_portrait.timer.timeout),
+            "progress_timer": self.widget.break_progress_timer.receivers(self.widget.break_progress_timer.timeout),
+            "scheduled_deadlines": len(self.scheduler.queue),
+        }
+        for index, button in enumerate(self.widget.dialogue_box.active_buttons):
+            counts[f"button_{index}"] = button.receivers(button.clicked)
+        return counts
+
+    def run(self):
+        """
+        Runs until the simulated time is up
+        :return: Summary of the run
+        """
+        self.widget.show_start_dialog()
+
+        while True:
+            events = [(self.next_user_action, self.press_button),
+                      (self.scheduler.get_next_deadline(), self.scheduler.process_deadlines),
+                      (self.next_animation_update, self.update_animation)]
+            events = [(time, action) for time, action in events if time is not None]
+            if not events:
+                break
+
+            time, action = min(events, key=lambda event: event[0])
+            if time > self.end_time:
+                break
+
+            self.clock.now = max(self.clock.now, time)
+            action()
+
+        self.clock.now = self.end_time
+        return self.get_summary()
+
+    def update_animation(self):
+        self.animation_updates += 1
+        self.widget.break_portrait.animation_update()
+        self.schedule_animation_update()
+
+    def get_summary(self):
+        states = {}
+        for entry in self.trace:
+            if entry["event"] == "state":
+                states[entry["state"]] = states.get(entry["state"], 0) + 1
+
+        deadlines = [entry for entry in self.trace if entry["event"] == "deadline"]
+        last_receivers = self.count_receivers()
+        leaks = {}
+        if self.first_receivers is not None:
+            leaks = {name: [self.first_receivers[name], count] for name, count in last_receivers.items()
+                     if count > self.first_receivers.get(name, count)}
+
+        return {
+            "simulated_days": self.end_time / self.DAY,
+            "states": states,
+            "deadlines_fired": len(deadlines),
+            "max_deadline_lateness": max([entry["lateness"] for entry in deadlines], default=0),
+            "animation_updates": self.animation_updates,
+            "receivers": last_receivers,
+            "leaks": leaks,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the break reminder against a virtual clock")
+    parser.add_argument("--days", type=float, default=7, help="How many days to simulate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for every random choice")
+    parser.add_argument("--trace", help="File to write the trace to, one JSON object per line")
+    args = parser.parse_args()
+
+    # No window or tray, just the widgets
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    app = QApplication(sys.argv)
+
+    simulation = Simulation(args.days, args.seed, ConfigReader(save_state=False))
+    summary = simulation.run()
+
+    if args.trace:
+        with open(args.trace, "w", encoding="utf-8") as file:
+            for entry in simulation.trace:
+                file.write(json.dumps(entry) + "\n")
+
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["leaks"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+from PyQt6.QtCore import QRect
+
+from DesktopAssistant.SpriteCache import sprite_cache
+
+# Frame files are named "Descriptive_Title_EyeStatus_Index.png", the index can have any number of digits
+FRAME_NAME_PATTERN = re.compile(r"^(?P<name>.+)_(?P<eye_status>[^_]+)_(?P<index>\d+)\.png$", re.IGNORECASE)
+
+
+def parse_frame_name(filename):
+    """
+    Splits up an animation frame's file name
+    :param filename: File name such as "Linear_Sitting_Smile_Stare_12.png"
+    :return: (sequence name, eye status, index) tuple, or None if the name doesn't follow the pattern
+    """
+    match = FRAME_NAME_PATTERN.match(filename)
+    if match is None:
+        return None
+    return match["name"].replace("_", ""), match["eye_status"], int(match["index"])
+
+
+def find_frames(image_dir):
+    """
+    Lists the animation frames in a directory by their file names
+    :param image_dir: Directory to look in
+    :return: List of (path, sequence name, eye status, index) tuples
+    """
+    frames = []
+    for path in sorted(Path(image_dir).glob("*.png")):
+        parsed = parse_frame_name(path.name)
+        if parsed is None:
+            print(f"Skipping {path}, frame names should look like Descriptive_Title_EyeStatus_Index.png")
+            continue
+        frames.append((path, *parsed))
+    return frames
+
+
+def get_sprite_key(path):
+    """
+    :return: Key a file goes by whether its path is relative or absolute, such as one the asset watcher found
+    """
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
+def get_file_hash(path):
+    """
+    :return: Hash of a file's contents, so art that's been replaced is noticed even if its size didn't change
+    """
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
+def get_scale_key(scale):
+    """
+    :return: How a device pixel ratio is written in the manifest, such as "1" or "1.5"
+    """
+    return f"{scale:g}"
+
+
+class SpriteAtlas:
+    """
+    Every sprite from the packed directories in one image per device pixel ratio, made by AtlasPacker. More
+    than one atlas can be added, such as one per theme pack. Manifests are read the first time anything is
+    looked up after they're added, but an atlas image is only decoded the first time a sprite is asked for at
+    its scale, and is let go again with release() once nothing is loading. Once the sprite cache has a copy of
+    an atlas, sprites are cut straight out of that instead.
+
+    Each sprite keeps a hash of the file it came from, and each directory its list of files, so art that's been
+    swapped out or added since the atlas was packed is loaded from its own file instead. Files are only hashed
+    again when their modified time or size changes, and the hashes are kept in the sprite cache between launches.
+    Hashing and reading the sprite cache happen outside the lock, so the asset loader's workers don't wait on
+    each other for them.
+    """
+    MANIFEST = os.path.join("Images", "atlas.json")
+    VERSION = 3
+
+    def __init__(self, manifest_path=MANIFEST):
+        self.manifest_paths = []
+        self.unread_manifests = []
+
+        # (manifest key, scale key) -> (atlas image path, atlas size in pixels)
+        self.atlases = {}
+
+        # Sprite key -> (manifest key, size, scale key -> rect, source file hash), and directory key -> list
+        # of frames
+        self.sprites = {}
+        self.directories = {}
+
+        # Sprite key -> ((modified time, size), whether the file matched its hash) as of the last check
+        self.checked_sources = {}
+
+        # (manifest key, scale key) -> decoded atlas QImage
+        self.images = {}
+        self.lock = threading.Lock()
+
+        self.add_manifest(manifest_path)
+
+    def add_manifest(self, manifest_path):
+        """
+        Adds another atlas. Sprites in more than one atlas come from the one added last
+        :param manifest_path: Path of the atlas manifest
+        """
+        with self.lock:
+            manifest_key = get_sprite_key(manifest_path)
+            if manifest_key not in self.manifest_paths:
+                self.manifest_paths.append(manifest_key)
+                self.unread_manifests.append(Path(manifest_path))
+
+    def load_manifest(self):
+        """
+        Reads any manifests that were added since the last lookup. Should be called with the lock held
+        """
+        while self.unread_manifests:
+            manifest_path = self.unread_manifests.pop(0)
+            if not manifest_path.exists():
+                continue
+
+            manifest_key = get_sprite_key(manifest_path)
+            atlases, sprites, directories = {}, {}, {}
+            try:
+                manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+                if manifest["version"] != self.VERSION:
+                    print(f"Ignoring {manifest_path}, it was packed for a different version")
+                    continue
+
+                base_dir = manifest_path.parent
+                for scale, atlas in manifest["scales"].items():
+                    atlases[manifest_key, scale] = (base_dir / atlas["image"], tuple(atlas["size"]))
+                for name, sprite in manifest["sprites"].items():
+                    rects = {scale: QRect(*rect) for scale, rect in sprite["rects"].items()}
+                    sprites[get_sprite_key(base_dir / name)] = \
+                        (manifest_key, tuple(sprite["size"]), rects, sprite["source_hash"])
+                for name, directory in manifest["directories"].items():
+                    directories[get_sprite_key(base_dir / name)] = \
+                        (directory["files"], [(base_dir / frame[0], *frame[1:]) for frame in directory["frames"]])
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                print(f"Error reading sprite atlas {manifest_path}: {error}")
+                continue
+
+            self.atlases.update(atlases)
+            self.sprites.update(sprites)
+            self.directories.update(directories)
+
+    def get_frames(self, image_dir):
+        """
+        Lists the animation frames in a directory, straight from the manifest if the directory hasn't changed
+        since it was packed
+        :param image_dir: Directory the frames are in
+        :return: List of (path, sequence name, eye status, index) tuples
+        """
+        with self.lock:
+            self.load_manifest()
+            packed = self.directories.get(get_sprite_key(image_dir))
+
+        if packed is not None:
+            files, frames = packed
+            if sorted(path.name for path in Path(image_dir).glob("*.png")) == files:
+                return frames
+        return find_frames(image_dir)
+
+    def get_image(self, path, size, scale, decode):
+        """
+        Cuts a sprite out of the atlas. Safe to call from the asset loader's worker threads
+        :param path: Path of the sprite's original file
+        :param size: (width, height) tuple the sprite is shown at
+        :param scale: Device pixel ratio the sprite is wanted for
+        :param decode: Function taking (path, size) that decodes the atlas image itself
+        :return: The sprite's QImage at size times scale pixels, or None if it isn't packed at that size and
+        scale or the file has changed
+        """
+        with self.lock:
+            self.load_manifest()
+            sprite = self.sprites.get(get_sprite_key(path))
+            if sprite is None:
+                return None
+
+            manifest_key, sprite_size, rects, source_hash = sprite
+            scale = get_scale_key(scale)
+            if sprite_size != tuple(size) or scale not in rects:
+                return None
+            atlas_key = (manifest_key, scale)
+            atlas, rect = self.atlases[atlas_key], rects[scale]
+
+        if not self.is_source_current(path, source_hash):
+            return None
+
+        with self.lock:
+            if atlas_key in self.images:
+                return self.images[atlas_key].copy(rect)
+
+        # Straight out of the sprite cache's copy of the atlas, only the sprite's own rows are read in
+        image = sprite_cache.load(*atlas, rect)
+        if image is not None:
+            return image
+
+        # Otherwise the whole atlas has to be decoded, which puts it in the sprite cache for next time
+        with self.lock:
+            if atlas_key not in self.images:
+                self.images[atlas_key] = decode(*atlas)
+            return self.images[atlas_key].copy(rect)
+
+    def is_source_current(self, path, source_hash):
+        """
+        :return: Whether a sprite's file still has the contents it was packed from. Should be called without the
+        lock held, the file might have to be read
+        """
+        key = get_sprite_key(path)
+        try:
+            stat = Path(path).stat()
+        except OSError:
+            # The atlas still has it even if the file is gone
+            return True
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            checked = self.checked_sources.get(key)
+        if checked is None or checked[0] != stamp:
+            try:
+                checked = (stamp, sprite_cache.get_hash(path, get_file_hash) == source_hash)
+            except OSError:
+                checked = (stamp, False)
+            with self.lock:
+                self.checked_sources[key] = checked
+        return checked[1]
+
+    def invalidate(self, paths):
+        """
+        Stops cutting files that changed on disk out of the atlas, they're loaded from their own files from then
+        on. Manifests that changed, such as from repacking, are read again
+        :param paths: Paths of the files that changed
+        """
+        with self.lock:
+            for path in paths:
+                key = get_sprite_key(path)
+                self.sprites.pop(key, None)
+                if key in self.manifest_paths:
+                    self.unread_manifests.append(Path(path))
+                    self.images = {}
+
+    def release(self):
+        """
+        Drops the decoded atlas images, the sprites already cut out of them are separate copies
+        """
+        with self.lock:
+            self.images = {}
+
+
+sprite_atlas = SpriteAtlas()
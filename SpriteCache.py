@@ -0,0 +1,148 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+from PyQt6.QtGui import QImage
+
+
+class SpriteCache:
+    """
+    On disk cache of already resized sprites. Each entry is the raw premultiplied ARGB pixels for one
+    (source file, size) pair, so later launches can map it straight in instead of decoding and resizing
+    full resolution PNGs. Entries are keyed by the source file's modification time and size, so changed
+    art gets rebuilt automatically.
+
+    The content hashes the sprite atlas checks its sources against are kept here too, keyed the same way, so
+    the source files are only read again once they change.
+    """
+    CACHE_DIR = os.path.join(".cache", "sprites")
+    MAGIC = b"LDAS"
+    VERSION = 4
+
+    # Magic, version, width, height, bytes per line, QImage format
+    HEADER = struct.Struct("<4sHIIII")
+    FORMAT = QImage.Format.Format_ARGB32_Premultiplied
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def entry_path(self, path, size):
+        """
+        Works out the cache file for a source image. The name starts with a hash of the source and
+        target size, so old versions of the same sprite can be found and cleaned up
+        :param path: Path of the source image
+        :param size: (width, height) tuple the image is resized to
+        :return: The Path of the cache entry
+        """
+        return self.get_versioned_path(path, f"{size[0]}x{size[1]}", ".argb")
+
+    def hash_path(self, path):
+        """
+        Works out the file a source image's content hash is kept in, named the same way as the sprites
+        :param path: Path of the source image
+        :return: The Path of the hash file
+        """
+        return self.get_versioned_path(path, "hash", ".sha1")
+
+    def get_versioned_path(self, path, kind, suffix):
+        path = Path(path).absolute()
+        stat = path.stat()
+        sprite_key = hashlib.sha1(f"{path}|{kind}".encode("utf-8")).hexdigest()[:16]
+        version_key = hashlib.sha1(f"{stat.st_mtime_ns}|{stat.st_size}".encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"{sprite_key}-{version_key}{suffix}"
+
+    def load(self, path, size, rect=None):
+        """
+        Loads a cached sprite if there's an up to date one
+        :param path: Path of the source image
+        :param size: (width, height) tuple the image is resized to
+        :param rect: QRect of the part to load, or None for all of it. Only that part of the file is read in
+        :return: The cached QImage, or None if it needs to be rebuilt
+        """
+        try:
+            entry = self.entry_path(path, size)
+            with open(entry, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, version, width, height, bytes_per_line, image_format = self.HEADER.unpack_from(data)
+                if magic != self.MAGIC or version != self.VERSION \
+                        or len(data) != self.HEADER.size + bytes_per_line * height:
+                    return None
+
+                # Wrap the mapped pixels, then copy them out once so the image outlives the mapping
+                pixels = memoryview(data)[self.HEADER.size:]
+                try:
+                    image = QImage(pixels, width, height, bytes_per_line, QImage.Format(image_format))
+                    return image.copy() if rect is None else image.copy(rect)
+                finally:
+                    pixels.release()
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def store(self, path, size, image):
+        """
+        Saves a resized sprite, replacing any older versions of it. Written to a temp file first so a
+        crash can't leave half an entry behind
+        :param path: Path of the source image
+        :param size: (width, height) tuple the image is resized to
+        :param image: The resized QImage
+        """
+        try:
+            image = image.convertToFormat(self.FORMAT)
+            header = self.HEADER.pack(self.MAGIC, self.VERSION, image.width(), image.height(),
+                                      image.bytesPerLine(), self.FORMAT.value)
+            self.write_entry(self.entry_path(path, size), [header, image.constBits().asstring(image.sizeInBytes())])
+        except OSError as error:
+            print(f"Error writing sprite cache for {path}: {error}")
+
+    def get_hash(self, path, compute):
+        """
+        Gets a source image's content hash, only working it out again if the file changed since the last time
+        :param path: Path of the source image
+        :param compute: Function taking the path that hashes the file's contents
+        :return: The hash
+        :raises OSError: If the file can't be read
+        """
+        # Named before the file is read, so a file that changes part way through gets hashed again next time
+        entry = self.hash_path(path)
+        try:
+            file_hash = entry.read_text(encoding="ascii").strip()
+            if file_hash:
+                return file_hash
+        except (OSError, ValueError):
+            pass
+
+        file_hash = compute(path)
+        try:
+            self.write_entry(entry, [file_hash.encode("ascii")])
+        except OSError as error:
+            print(f"Error writing sprite cache for {path}: {error}")
+        return file_hash
+
+    def write_entry(self, entry, chunks):
+        """
+        Writes a cache file, then cleans out the older versions of it. Written to a temp file first so a crash
+        can't leave half an entry behind
+        :param entry: Path of the cache file
+        :param chunks: List of bytes to write
+        :raises OSError: If it couldn't be written
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        handle, temp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+            os.replace(temp_name, entry)
+        except OSError:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+        sprite_key = entry.name.split("-")[0]
+        for old_entry in self.cache_dir.glob(f"{sprite_key}-*{entry.suffix}"):
+            if old_entry != entry:
+                old_entry.unlink(missing_ok=True)
+
+
+sprite_cache = SpriteCache()
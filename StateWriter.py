@@ -0,0 +1,147 @@
+import atexit
+import codecs
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+class StateWriter:
+    """
+    Saves PROPERTY=VALUE changes back into a config file from a background thread. Changes are merged and
+    only written once things go quiet for DEBOUNCE_DELAY seconds, and every write goes to a temp file that
+    then replaces the real one, so a crash can never leave the file half written. Keys the file doesn't
+    have yet are added to the end.
+    """
+    DEBOUNCE_DELAY = 0.5
+
+    def __init__(self, filename, template_filename=None):
+        """
+        :param filename: Config file to write to
+        :param template_filename: Copied to filename first if it doesn't exist yet
+        """
+        self.filename = filename
+        self.template_filename = template_filename
+
+        self.pending = {}
+        self.writing = {}
+        self.condition = threading.Condition()
+
+        # When the last change that actually changed something came in, and whether a flush wants the pending
+        # values written without waiting for things to go quiet
+        self.last_change = 0
+        self.flush_requested = False
+
+        self.thread = threading.Thread(target=self.run, name="StateWriter", daemon=True)
+        self.thread.start()
+
+        # Don't lose the last changes when the app closes
+        atexit.register(self.flush)
+
+    def set(self, key, value):
+        """
+        Queues a value to be written
+        :param key: Config property name
+        :param value: New value, written with str()
+        """
+        with self.condition:
+            value = str(value)
+            if self.pending.get(key) == value:
+                return
+
+            self.pending[key] = value
+            self.last_change = time.monotonic()
+            self.condition.notify_all()
+
+    def get_pending(self):
+        """
+        :return: Copy of the values that haven't made it to disk yet
+        """
+        with self.condition:
+            return {**self.writing, **self.pending}
+
+    def flush(self):
+        """
+        Blocks until every queued value has been written, or gives up if the writer thread isn't running
+        """
+        with self.condition:
+            if self.pending:
+                self.flush_requested = True
+                self.condition.notify_all()
+            while (self.pending or self.writing) and self.thread.is_alive():
+                self.condition.wait(0.1)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+                # Keep waiting until nothing has changed for DEBOUNCE_DELAY. Waits can end early from other
+                # notifications, so the deadline is worked out again each time unless a flush wants them now
+                while not self.flush_requested:
+                    remaining = self.last_change + self.DEBOUNCE_DELAY - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                self.flush_requested = False
+                values = self.writing = self.pending
+                self.pending = {}
+
+            try:
+                self.write_values(values)
+            except Exception as error:
+                # Anything else, such as a hand edited file that isn't UTF-8, would end the thread and leave
+                # every later change unsaved
+                print(f"Error saving {self.filename}: {error}")
+            finally:
+                with self.condition:
+                    self.writing = {}
+                    self.condition.notify_all()
+
+    def write_values(self, values):
+        """
+        Rewrites the file with the given values swapped in, keeping every other line as it was
+        :param values: Dictionary of property to new value
+        """
+        if not Path(self.filename).exists() and self.template_filename and Path(self.template_filename).exists():
+            shutil.copyfile(self.template_filename, self.filename)
+
+        lines = []
+        if Path(self.filename).exists():
+            with codecs.open(self.filename, encoding="utf-8") as file:
+                lines = file.readlines()
+
+        # Match whatever line endings the file already uses
+        newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+
+        remaining = dict(values)
+        new_lines = []
+        for line in lines:
+            key = line.split("#")[0].split("=", 1)[0].strip()
+            if not line.startswith("#") and "=" in line and key in remaining:
+                new_lines.append(f"{key}={remaining.pop(key)}{newline}")
+            else:
+                new_lines.append(line)
+
+        # Older files might not have every key yet
+        if remaining:
+            if new_lines and not new_lines[-1].endswith("\n"):
+                new_lines[-1] += newline
+            for key, value in remaining.items():
+                new_lines.append(f"{key}={value}{newline}")
+
+        directory = Path(self.filename).absolute().parent
+        handle, temp_name = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8", newline="") as file:
+                file.writelines(new_lines)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_name, self.filename)
+        except OSError:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
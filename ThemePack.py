@@ -0,0 +1,98 @@
+import json
+from pathlib import Path
+
+from DesktopAssistant.SpriteAtlas import sprite_atlas
+
+
+class ThemePack:
+    """
+    A character's art, described by a pack.json manifest in the pack's folder. Making one only reads the
+    manifest, nothing is decoded until the pack is shown. Every path in the manifest is relative to the pack
+    folder, and any that are left out use the same names as the built in pack:
+
+    {
+        "name": "Linear",
+        "frames": "Linear",
+        "wall": "Linear_Wall",
+        "dialogue_box": "DialogueBox.png",
+        "icon": "wrinkle.png",
+        "atlas": "atlas.json"
+    }
+
+    The frames folder holds the break animation, named "Descriptive_Title_EyeStatus_Index.png", and the wall
+    folder holds head.png, head_happy.png, head_sad.png and hands.png.
+    """
+    MANIFEST = "pack.json"
+    DEFAULT_NAME = "Linear"
+
+    # Folders searched for packs. The built in pack lives right in Images/, the rest each get a folder in Packs/
+    DEFAULT_DIRECTORY = "Images"
+    PACKS_DIRECTORY = "Packs"
+
+    def __init__(self, manifest_path):
+        """
+        :param manifest_path: Path of the pack's pack.json
+        :raises ValueError: If the manifest can't be read
+        """
+        self.directory = Path(manifest_path).parent
+        try:
+            manifest = json.loads(Path(manifest_path).read_text(encoding="utf-8"))
+            self.name = manifest.get("name", self.directory.name)
+            self.frames_dir = self.directory / manifest.get("frames", "Linear")
+            self.wall_dir = self.directory / manifest.get("wall", "Linear_Wall")
+            self.dialogue_box_path = self.directory / manifest.get("dialogue_box", "DialogueBox.png")
+            self.icon_path = self.directory / manifest.get("icon", "wrinkle.png")
+            self.atlas_path = self.directory / manifest.get("atlas", "atlas.json")
+        except (OSError, ValueError, AttributeError, TypeError) as error:
+            raise ValueError(f"can't read {manifest_path}: {error}")
+
+    def get_wall_image_path(self, image_name):
+        return self.wall_dir / image_name
+
+    def activate(self):
+        """
+        Called before the pack is first shown. Lets the asset loader cut its art out of the pack's atlas
+        """
+        if self.atlas_path.exists():
+            sprite_atlas.add_manifest(self.atlas_path)
+
+    def contains(self, path):
+        """
+        :return: Whether an image path belongs to this pack
+        """
+        return Path(path).absolute().is_relative_to(self.directory.absolute())
+
+
+def find_packs():
+    """
+    Finds every installed pack by reading just their manifests
+    :return: Dictionary of pack name to ThemePack, the built in pack first
+    """
+    manifests = [Path(ThemePack.DEFAULT_DIRECTORY) / ThemePack.MANIFEST]
+    manifests += sorted(Path(ThemePack.PACKS_DIRECTORY).glob(f"*/{ThemePack.MANIFEST}"))
+
+    packs = {}
+    for manifest in manifests:
+        if not manifest.exists():
+            continue
+        try:
+            pack = ThemePack(manifest)
+        except ValueError as error:
+            print(f"Error loading theme pack: {error}")
+            continue
+        packs.setdefault(pack.name, pack)
+    return packs
+
+
+def find_pack(name, packs=None):
+    """
+    :param name: Name of the pack to find
+    :param packs: Already found packs, or None to look for them
+    :return: The pack with that name, or the built in one if it isn't installed
+    """
+    packs = packs if packs is not None else find_packs()
+    if name in packs:
+        return packs[name]
+
+    print(f"Theme pack {name} isn't installed, using {ThemePack.DEFAULT_NAME}")
+    return packs.get(ThemePack.DEFAULT_NAME) or ThemePack(Path(ThemePack.DEFAULT_DIRECTORY) / ThemePack.MANIFEST)